@@ -0,0 +1,89 @@
+"""
+Benchmark batch cache serializers (size and throughput) on the record and
+proxy batches of the ec_meetings and eu_authorities fixtures
+
+    python -m benchmarks.cache
+"""
+
+import time
+from pathlib import Path
+from typing import Any
+
+from investigraph.cache import get_serializer
+from investigraph.exceptions import ImproperlyConfigured
+from investigraph.logic.extract import extract_pandas
+from investigraph.model import Config, Resolver, Source
+from investigraph.model.context import init_context
+
+FIXTURES_PATH = (Path(__file__).parent.parent / "tests" / "fixtures").absolute()
+CHUNK_SIZE = 1_000
+
+DATASETS = {
+    "ec_meetings": (
+        FIXTURES_PATH / "ec_meetings" / "config.yml",
+        FIXTURES_PATH / "ec-meetings.xlsx",
+    ),
+    "eu_authorities": (
+        FIXTURES_PATH / "eu_authorities.local.yml",
+        FIXTURES_PATH / "all-authorities.csv",
+    ),
+}
+
+SERIALIZERS = [
+    ("pickle", None),
+    ("pickle", "zstd"),
+    ("pickle", "lz4"),
+    ("orjson", None),
+    ("orjson", "zstd"),
+    ("orjson", "lz4"),
+    ("msgpack", None),
+    ("msgpack", "zstd"),
+    ("msgpack", "lz4"),
+]
+
+
+def chunked(items: list[Any], size: int = CHUNK_SIZE) -> list[list[Any]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def get_batches(config_uri: Path, uri: Path) -> dict[str, list[list[Any]]]:
+    config = Config.from_uri(config_uri)
+    source = Source(uri=uri, pandas=config.extract.pandas)
+    ctx = init_context(config, source)
+    records = [(r, ix) for ix, r in enumerate(extract_pandas(Resolver(source=source)))]
+    proxies = [
+        p.to_dict() for r, ix in records for p in config.transform.handle(ctx, r, ix)
+    ]
+    return {"records": chunked(records), "proxies": chunked(proxies)}
+
+
+def measure(name: str, compression: str | None, batches: list[Any]) -> str:
+    try:
+        serializer = get_serializer(name, compression)
+    except ImproperlyConfigured as e:
+        return f"skipped ({e})"
+    start = time.perf_counter()
+    dumped = [serializer.dumps(b) for b in batches]
+    dumps = time.perf_counter() - start
+    start = time.perf_counter()
+    for data in dumped:
+        serializer.loads(data)
+    loads = time.perf_counter() - start
+    size = sum(len(d) for d in dumped)
+    return (
+        f"{size / 1024 / 1024:>8.2f} MB | dumps {dumps * 1000:>8.1f} ms | "
+        f"loads {loads * 1000:>8.1f} ms"
+    )
+
+
+def main() -> None:
+    for dataset, (config_uri, uri) in DATASETS.items():
+        for kind, batches in get_batches(config_uri, uri).items():
+            print(f"{dataset} {kind} ({len(batches)} batches):")
+            for name, compression in SERIALIZERS:
+                label = f"{name}+{compression}" if compression else name
+                print(f"  {label:>14}: {measure(name, compression, batches)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Generate synthetic sources (csv, xlsx, json) with a number of rows and a width
+of their text columns, and the dataset configs mapping them to companies,
+their directors and directorships (one config per aggregate handler)
+
+    python -m benchmarks.datasets [format] [size] [width]
+"""
+
+import string
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from investigraph.settings import SETTINGS
+
+DATA_PATH = SETTINGS.data_root / "benchmarks"
+FORMATS = ["csv", "xlsx", "json"]
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+AGGREGATORS = {
+    "in_memory": "investigraph.logic.aggregate:in_memory",
+    "in_db": "db",
+}
+XLSX_MAX_ROWS = 1_048_575  # plus the header row
+CHUNK_SIZE = 100_000
+COUNTRIES = ["de", "fr", "it", "es", "pl", "nl", "be", "at", "dk", "se"]
+
+QUERY = {
+    "entities": {
+        "company": {
+            "schema": "Company",
+            "keys": ["id"],
+            "properties": {
+                "name": {"column": "name"},
+                "jurisdiction": {"column": "country"},
+                "incorporationDate": {"column": "incorporated"},
+                "description": {"column": "notes"},
+            },
+        },
+        "director": {
+            "schema": "Person",
+            "keys": ["director_id"],
+            "properties": {"name": {"column": "director"}},
+        },
+        "directorship": {
+            "schema": "Directorship",
+            "keys": ["id", "director_id"],
+            "properties": {
+                "organization": {"entity": "company"},
+                "director": {"entity": "director"},
+            },
+        },
+    }
+}
+
+
+def get_name(fmt: str, size: str, width: int) -> str:
+    return f"bench_{fmt}_{size}_w{width}"
+
+
+def get_entity_count(rows: int) -> int:
+    # companies, directorships and the directors shared by 10 companies each
+    return 2 * rows + get_directors(rows)
+
+
+def get_directors(rows: int) -> int:
+    return max(1, rows // 10)
+
+
+def make_texts(rng: np.random.Generator, width: int, n: int = 1_000) -> np.ndarray:
+    chars = np.array(list(string.ascii_lowercase + " "))
+    return np.array(["".join(t) for t in rng.choice(chars, size=(n, width))])
+
+
+def make_labels(texts: np.ndarray, ix: np.ndarray) -> pd.Series:
+    return pd.Series(texts[ix % len(texts)]) + " " + pd.Series(ix).astype(str)
+
+
+def make_frame(
+    rng: np.random.Generator, texts: np.ndarray, start: int, rows: int, total: int
+) -> pd.DataFrame:
+    ix = np.arange(start, start + rows)
+    directors = ix % get_directors(total)
+    dates = np.datetime64("2000-01-01") + (ix % 7300).astype("timedelta64[D]")
+    return pd.DataFrame(
+        {
+            "id": pd.Series(ix).map("c-{}".format),
+            "name": make_labels(texts, ix),
+            "country": rng.choice(COUNTRIES, size=rows),
+            "incorporated": pd.Series(dates).dt.strftime("%Y-%m-%d"),
+            "notes": texts[rng.integers(0, len(texts), size=rows)],
+            "director_id": pd.Series(directors).map("p-{}".format),
+            "director": make_labels(texts, directors),
+        }
+    )
+
+
+def make_frames(rows: int, width: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    texts = make_texts(rng, width)
+    for start in range(0, rows, CHUNK_SIZE):
+        yield make_frame(rng, texts, start, min(CHUNK_SIZE, rows - start), rows)
+
+
+def write_source(path: Path, fmt: str, rows: int, width: int) -> None:
+    if fmt == "csv":
+        for ix, df in enumerate(make_frames(rows, width)):
+            df.to_csv(path, mode="a" if ix else "w", header=not ix, index=False)
+    elif fmt == "json":
+        with open(path, "w") as fh:
+            fh.write("[")
+            for ix, df in enumerate(make_frames(rows, width)):
+                if ix:
+                    fh.write(",")
+                fh.write(df.to_json(orient="records")[1:-1])
+            fh.write("]")
+    elif fmt == "xlsx":
+        if rows > XLSX_MAX_ROWS:
+            raise ValueError(f"xlsx supports only {XLSX_MAX_ROWS} rows")
+        pd.concat(make_frames(rows, width)).to_excel(path, index=False)
+    else:
+        raise ValueError(f"Unknown format: `{fmt}`")
+
+
+def write_configs(path: Path, name: str, source: Path, rows: int) -> None:
+    for aggregator, handler in AGGREGATORS.items():
+        config = {
+            "name": name,
+            "title": f"Synthetic benchmark dataset ({source.name}, {rows} rows)",
+            "extract": {"sources": [{"uri": str(source)}]},
+            "transform": {"queries": [QUERY]},
+            "aggregate": {"handler": handler},
+        }
+        with open(path / f"config.{aggregator}.yml", "w") as fh:
+            yaml.safe_dump(config, fh, sort_keys=False)
+
+
+def generate(fmt: str, size: str, width: int, force: bool | None = False) -> Path:
+    """
+    Generate (if not already there) a synthetic dataset, returns its folder
+    """
+    name = get_name(fmt, size, width)
+    rows = SIZES[size]
+    path = DATA_PATH / name
+    source = path / f"source.{fmt}"
+    if force or not source.exists():
+        path.mkdir(parents=True, exist_ok=True)
+        write_source(source, fmt, rows, width)
+    write_configs(path, name, source, rows)
+    return path
+
+
+def main() -> None:
+    fmt = sys.argv[1] if len(sys.argv) > 1 else "csv"
+    size = sys.argv[2] if len(sys.argv) > 2 else "10k"
+    width = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    print(generate(fmt, size, width))
+
+
+if __name__ == "__main__":
+    main()
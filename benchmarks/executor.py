@@ -0,0 +1,47 @@
+"""
+Benchmark a full pipeline run through the prefect engine against the local
+executor on the eu_authorities fixture, once as a single batch and once split
+into many small batches to show the per-task overhead (wall time in seconds,
+best of n rounds)
+
+    python -m benchmarks.executor [rounds]
+"""
+
+import sys
+import time
+from typing import Callable
+
+from investigraph.model import Flow, FlowOptions
+from investigraph.pipeline import run, run_local
+
+from .extract import FIXTURES_PATH
+
+CONFIG = str(FIXTURES_PATH / "eu_authorities.local.yml")
+CHUNK_SIZES = [1_000, 10]
+
+
+def measure(
+    func: Callable[[FlowOptions], Flow], options: FlowOptions, rounds: int
+) -> float:
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(options)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    for chunk_size in CHUNK_SIZES:
+        options = FlowOptions(config=CONFIG, chunk_size=chunk_size)
+        prefect = measure(run, options, rounds)
+        local = measure(run_local, options, rounds)
+        print(
+            f"chunk size {chunk_size:>5}: prefect {prefect:>7.2f}s | "
+            f"local {local:>7.2f}s | {prefect / local:>5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark the extract stage record emission (rows/s) on the test fixtures
+
+    python -m benchmarks.extract
+"""
+
+import time
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from investigraph.logic.extract import yield_pandas
+from investigraph.types import RecordGenerator
+
+FIXTURES_PATH = (Path(__file__).parent.parent / "tests" / "fixtures").absolute()
+
+SOURCES = {
+    "csv": lambda: pd.read_csv(FIXTURES_PATH / "all-authorities.csv"),
+    "xlsx": lambda: pd.read_excel(FIXTURES_PATH / "ec-meetings.xlsx", skiprows=1),
+}
+
+
+def yield_pandas_iterrows(df: pd.DataFrame) -> RecordGenerator:
+    # the previous row-by-row implementation
+    for _, row in df.iterrows():
+        yield dict(row.replace(np.nan, None))
+
+
+def measure(
+    func: Callable[[pd.DataFrame], RecordGenerator],
+    df: pd.DataFrame,
+    min_rows: int = 100_000,
+) -> float:
+    rounds = max(1, min_rows // max(len(df), 1))
+    rows = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for _ in func(df):
+            rows += 1
+    return rows / (time.perf_counter() - start)
+
+
+def main() -> None:
+    for name, read in SOURCES.items():
+        df = read()
+        before = measure(yield_pandas_iterrows, df)
+        after = measure(yield_pandas, df)
+        print(
+            f"{name:>5}: {len(df):>6} rows | iterrows {before:>12,.0f} rows/s | "
+            f"vectorized {after:>12,.0f} rows/s | {after / before:>5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
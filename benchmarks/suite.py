@@ -0,0 +1,298 @@
+"""
+Benchmark suite on synthetic datasets (see `benchmarks.datasets`): every stage
+on its own, and the full pipeline with every task runner (and the local
+executor) and aggregate handler. Each measurement runs in its own process (a
+task runner is chosen at import time). Results go to a json file that can be
+compared between commits:
+
+    python -m benchmarks.suite run --size 10k -o before.json
+    git checkout <other commit>
+    python -m benchmarks.suite run --size 10k -o after.json
+    python -m benchmarks.suite compare before.json after.json --threshold 0.1
+"""
+
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Annotated, Optional
+
+import typer
+from pydantic import BaseModel
+from rich import print
+from rich.console import Console
+from rich.table import Table
+
+from investigraph.logic.transform import transform_batch
+from investigraph.metrics import get_metrics
+from investigraph.model import Flow, FlowOptions, Resolver
+from investigraph.model.context import init_context
+from investigraph.pipeline import run, run_local
+from investigraph.settings import VERSION
+
+from .datasets import AGGREGATORS, FORMATS, SIZES, generate
+
+ROOT = Path(__file__).parent.parent
+CHUNK_SIZE = 1_000
+THRESHOLD = 0.1  # allowed slowdown
+RESULTS = Path("bench.json")
+RUNNERS = {  # name: (executor, prefect task runner)
+    "concurrent": ("prefect", None),
+    "dask": ("prefect", "dask"),
+    "ray": ("prefect", "ray"),
+    "local": ("local", None),
+}
+STAGES = ["extract", "transform", "load"]
+
+cli = typer.Typer(no_args_is_help=True)
+console = Console()
+
+
+class Result(BaseModel):
+    rows: int
+    seconds: float | None = None
+    peak_rss: int | None = None  # bytes, of the measuring process
+    error: str | None = None
+
+    @property
+    def rows_per_second(self) -> float | None:
+        if self.seconds:
+            return self.rows / self.seconds
+
+
+class Report(BaseModel):
+    version: str = VERSION
+    commit: str | None = None
+    python: str = platform.python_version()
+    created_at: datetime
+    results: dict[str, Result] = {}
+
+
+def get_commit() -> str | None:
+    res = subprocess.run(
+        ["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True
+    )
+    return res.stdout.strip() or None
+
+
+def get_config(path: Path, aggregator: str) -> str:
+    return str(path / f"config.{aggregator}.yml")
+
+
+def get_peak_rss() -> int:
+    metrics = get_metrics()
+    metrics.update_rss()
+    return metrics.process_peak_rss
+
+
+def measure_stages(path: Path) -> dict[str, Result]:
+    """
+    Run the stages one after another in this process, batch by batch, and
+    aggregate the loaded fragments with each aggregate handler
+    """
+    flow = Flow.from_options(FlowOptions(config=get_config(path, "in_memory")))
+    ctx = init_context(flow.config, flow.config.extract.sources[0])
+    records = ctx.config.extract.handle(ctx, Resolver(source=ctx.source))
+    seconds = {stage: 0.0 for stage in STAGES}
+    rows = 0
+    fragments = []
+    while True:
+        start = time.perf_counter()
+        batch = list(islice(records, CHUNK_SIZE))
+        seconds["extract"] += time.perf_counter() - start
+        if not batch:
+            break
+        start = time.perf_counter()
+        proxies = transform_batch(
+            ctx, [(r, ix) for ix, r in enumerate(batch, rows + 1)]
+        )
+        seconds["transform"] += time.perf_counter() - start
+        start = time.perf_counter()
+        ckey = f"benchmark-{len(fragments)}"
+        fragments.append(ctx.load_fragments(proxies, ckey=ckey))
+        seconds["load"] += time.perf_counter() - start
+        rows += len(batch)
+    results = {s: Result(rows=rows, seconds=seconds[s]) for s in STAGES}
+
+    for aggregator in AGGREGATORS:
+        flow = Flow.from_options(FlowOptions(config=get_config(path, aggregator)))
+        ctx = init_context(flow.config, flow.config.extract.sources[0])
+        start = time.perf_counter()
+        ctx.aggregate(ctx, fragments)
+        elapsed = time.perf_counter() - start
+        results[f"aggregate/{aggregator}"] = Result(rows=rows, seconds=elapsed)
+
+    peak_rss = get_peak_rss()
+    for result in results.values():
+        result.peak_rss = peak_rss
+    return results
+
+
+def measure_pipeline(config: str, executor: str, rows: int) -> Result:
+    options = FlowOptions(config=config, chunk_size=CHUNK_SIZE)
+    start = time.perf_counter()
+    if executor == "local":
+        run_local(options)
+    else:
+        run(options)
+    return Result(
+        rows=rows, seconds=time.perf_counter() - start, peak_rss=get_peak_rss()
+    )
+
+
+def spawn(args: list[str], rows: int, runner: str | None = None) -> dict[str, Result]:
+    """
+    Run a measurement in a new process (with the given prefect task runner)
+    """
+    env = {k: v for k, v in os.environ.items() if k != "PREFECT_TASK_RUNNER"}
+    if runner is not None:
+        env["PREFECT_TASK_RUNNER"] = runner
+    with TemporaryDirectory() as tmp:
+        out = Path(tmp) / "result.json"
+        res = subprocess.run(
+            [sys.executable, "-m", "benchmarks.suite", *args, "--out", str(out)],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if res.returncode != 0:
+            error = "\n".join(res.stderr.strip().splitlines()[-5:])
+            return {"": Result(rows=rows, error=error)}
+        return Report.model_validate_json(out.read_text()).results
+
+
+def write_results(out: Path, results: dict[str, Result]) -> None:
+    report = Report(commit=get_commit(), created_at=datetime.utcnow(), results=results)
+    out.write_text(report.model_dump_json(indent=2))
+
+
+def print_result(name: str, result: Result) -> None:
+    if result.error:
+        print(f"[bold red]ERROR[/bold red] {name}: {result.error}")
+    else:
+        print(
+            f"[bold green]OK[/bold green] {name}: {result.seconds:.2f}s "
+            f"({result.rows_per_second:.0f} rows/s, "
+            f"{(result.peak_rss or 0) / 1024 / 1024:.0f} MB peak rss)"
+        )
+
+
+@cli.command("run")
+def cli_run(
+    out: Annotated[Path, typer.Option("-o", help="Results file")] = RESULTS,
+    formats: Annotated[Optional[list[str]], typer.Option("--format")] = None,
+    size: Annotated[
+        Optional[list[str]], typer.Option(..., help="10k, 1m or 10m")
+    ] = None,
+    width: Annotated[int, typer.Option(..., help="Chars of text columns")] = 20,
+    runner: Annotated[Optional[list[str]], typer.Option(...)] = None,
+    aggregator: Annotated[Optional[list[str]], typer.Option(...)] = None,
+    stages: Annotated[bool, typer.Option(..., help="Measure single stages")] = True,
+    pipeline: Annotated[bool, typer.Option(..., help="Measure full runs")] = True,
+):
+    """
+    Generate the synthetic datasets (if needed) and benchmark them
+    """
+    for label in size or []:
+        if label not in SIZES:
+            raise typer.BadParameter(f"Unknown size: `{label}`")
+    for runner_name in runner or []:
+        if runner_name not in RUNNERS:
+            raise typer.BadParameter(f"Unknown runner: `{runner_name}`")
+    results = {}
+    for fmt in formats or FORMATS:
+        for label in size or ["10k"]:
+            try:
+                path = generate(fmt, label, width)
+            except ValueError as e:
+                print(f"[bold yellow]SKIP[/bold yellow] {fmt} {label}: {e}")
+                continue
+            rows = SIZES[label]
+            name = path.name
+            if stages:
+                for stage, result in spawn(["stages", str(path)], rows).items():
+                    key = "/".join(filter(None, ("stage", name, stage)))
+                    results[key] = result
+                    print_result(key, result)
+            if pipeline:
+                for runner_name in runner or RUNNERS:
+                    executor, task_runner = RUNNERS[runner_name]
+                    for agg in aggregator or AGGREGATORS:
+                        config = get_config(path, agg)
+                        args = ["pipeline", config, "--executor", executor]
+                        args += ["--rows", str(rows)]
+                        for result in spawn(args, rows, task_runner).values():
+                            key = f"pipeline/{name}/{runner_name}/{agg}"
+                            results[key] = result
+                            print_result(key, result)
+            write_results(out, results)  # keep what we have so far
+    print(f"[bold green]OK[/bold green] results written to `{out}`")
+
+
+@cli.command("stages", hidden=True)
+def cli_stages(path: Path, out: Annotated[Path, typer.Option(...)]):
+    write_results(out, measure_stages(path))
+
+
+@cli.command("pipeline", hidden=True)
+def cli_pipeline(
+    config: str,
+    out: Annotated[Path, typer.Option(...)],
+    executor: Annotated[str, typer.Option(...)] = "prefect",
+    rows: Annotated[int, typer.Option(...)] = 0,
+):
+    write_results(out, {"": measure_pipeline(config, executor, rows)})
+
+
+@cli.command("compare")
+def cli_compare(
+    base: Path,
+    head: Path,
+    threshold: Annotated[
+        float, typer.Option(..., help="Allowed slowdown, e.g. 0.1 for 10%")
+    ] = THRESHOLD,
+):
+    """
+    Compare two results files, exits with an error if a benchmark got slower
+    than the threshold allows
+    """
+    base_results = Report.model_validate_json(base.read_text()).results
+    head_results = Report.model_validate_json(head.read_text()).results
+    table = Table("benchmark", "base (s)", "head (s)", "change", "")
+    regressions = 0
+    for name in sorted(base_results.keys() & head_results.keys()):
+        before, after = base_results[name], head_results[name]
+        if not before.seconds or not after.seconds:
+            table.add_row(name, str(before.seconds), str(after.seconds), "", "error")
+            continue
+        change = after.seconds / before.seconds - 1
+        status = ""
+        if change > threshold:
+            status = "[bold red]REGRESSION[/bold red]"
+            regressions += 1
+        elif change < -threshold:
+            status = "[bold green]faster[/bold green]"
+        table.add_row(
+            name,
+            f"{before.seconds:.2f}",
+            f"{after.seconds:.2f}",
+            f"{change:+.1%}",
+            status,
+        )
+    console.print(table)
+    if regressions:
+        print(
+            f"[bold red]ERROR[/bold red] {regressions} benchmarks "
+            f"more than {threshold:.0%} slower"
+        )
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    cli()
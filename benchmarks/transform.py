@@ -0,0 +1,67 @@
+"""
+Benchmark the transform stage (records/s) in the current process and in
+process pools of growing size on the eu_authorities fixture
+
+    python -m benchmarks.transform [max processes]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from investigraph.logic.extract import yield_pandas
+from investigraph.logic.transform import transform_batch
+from investigraph.model import Config
+from investigraph.model.context import init_context
+from investigraph.pool import TransformPool
+
+from .extract import FIXTURES_PATH
+
+CHUNK_SIZE = 1_000
+
+
+def get_batches(min_rows: int = 100_000) -> list[list[tuple[dict, int]]]:
+    df = pd.read_csv(FIXTURES_PATH / "all-authorities.csv")
+    records = list(yield_pandas(df))
+    rounds = max(1, min_rows // len(records))
+    records = [(rec, ix) for ix, rec in enumerate(records * rounds, 1)]
+    return [records[i : i + CHUNK_SIZE] for i in range(0, len(records), CHUNK_SIZE)]
+
+
+def main() -> None:
+    config = Config.from_uri(FIXTURES_PATH / "eu_authorities.local.yml")
+    ctx = init_context(config, config.extract.sources[0])
+    batches = get_batches()
+    rows = sum(len(b) for b in batches)
+
+    start = time.perf_counter()
+    for batch in batches:
+        transform_batch(ctx, batch)
+    serial = rows / (time.perf_counter() - start)
+    print(f"{'serial':>11}: {serial:>10,.0f} records/s")
+
+    max_processes = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+    processes = 1
+    while processes <= max_processes:
+        pool = TransformPool(config, processes)
+        # start and warm up all workers before measuring
+        wait([pool.executor.submit(int) for _ in range(processes * 2)])
+        start = time.perf_counter()
+        # submit from threads, like the task runner does
+        with ThreadPoolExecutor(processes * 2) as threads:
+            for batch in batches:
+                threads.submit(pool.transform_records, ctx, batch)
+        result = rows / (time.perf_counter() - start)
+        pool.shutdown()
+        print(
+            f"{processes:>2} processes: {result:>10,.0f} records/s | "
+            f"{result / serial:>5.1f}x"
+        )
+        processes *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,271 @@
+import copy
+import hashlib
 import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
 from functools import cache
-from typing import Any, Iterable, Set
+from typing import Any, Generator, Iterable, Protocol, Set
 
 import fakeredis
+import orjson
 import redis
 from anystore.util import make_data_checksum
 from cachelib.serializers import RedisSerializer
+from pydantic import BaseModel
 
+from investigraph.exceptions import ImproperlyConfigured
+from investigraph.metrics import get_metrics
 from investigraph.settings import SETTINGS
+from investigraph.spool import Spool
 
 log = logging.getLogger(__name__)
 
 DELETE = SETTINGS.debug or not SETTINGS.redis_persist
 
 
+class Serializer(Protocol):
+    def dumps(self, value: Any) -> bytes: ...  # noqa: E704
+
+    def loads(self, value: bytes) -> Any: ...  # noqa: E704
+
+
+def _default(value: Any) -> Any:
+    # values the compact serializers don't know (datetime subclasses like
+    # pandas timestamps, numpy scalars, ...)
+    if isinstance(value, date):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+class OrjsonSerializer:
+    """
+    Serialize json-like data with orjson. Tuples become lists and non-json
+    values are converted to strings.
+    """
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, value: bytes) -> Any:
+        return orjson.loads(value)
+
+
+class MsgpackSerializer:
+    """
+    Serialize json-like data with msgpack. Tuples become lists and non-json
+    values are converted to strings.
+    """
+
+    def __init__(self) -> None:
+        try:
+            import msgpack
+        except ImportError:
+            raise ImproperlyConfigured(
+                "Install `investigraph[msgpack]` to use this serializer"
+            )
+        self.msgpack = msgpack
+
+    def dumps(self, value: Any) -> bytes:
+        return self.msgpack.packb(value, default=_default, use_bin_type=True)
+
+    def loads(self, value: bytes) -> Any:
+        return self.msgpack.unpackb(value, raw=False, strict_map_key=False)
+
+
+class CompressedSerializer:
+    """
+    Wrap a serializer with zstd or lz4 frame compression
+    """
+
+    def __init__(self, serializer: Serializer, compression: str) -> None:
+        self.serializer = serializer
+        try:
+            if compression == "zstd":
+                import zstandard
+
+                self.compress = zstandard.ZstdCompressor().compress
+                self.decompress = zstandard.ZstdDecompressor().decompress
+            elif compression == "lz4":
+                import lz4.frame
+
+                self.compress = lz4.frame.compress
+                self.decompress = lz4.frame.decompress
+            else:
+                raise ImproperlyConfigured(f"Unknown compression: `{compression}`")
+        except ImportError:
+            raise ImproperlyConfigured(
+                f"Install `investigraph[{compression}]` to use compression"
+            )
+
+    def dumps(self, value: Any) -> bytes:
+        return self.compress(self.serializer.dumps(value))
+
+    def loads(self, value: bytes) -> Any:
+        return self.serializer.loads(self.decompress(value))
+
+
+def get_serializer(
+    name: str | None = SETTINGS.cache_serializer,
+    compression: str | None = SETTINGS.cache_compression,
+) -> Serializer:
+    if name == "orjson":
+        serializer = OrjsonSerializer()
+    elif name == "msgpack":
+        serializer = MsgpackSerializer()
+    elif name in (None, "pickle"):
+        serializer = RedisSerializer()
+    else:
+        raise ImproperlyConfigured(f"Unknown serializer: `{name}`")
+    if compression:
+        return CompressedSerializer(serializer, compression)
+    return serializer
+
+
+class RunInfo(BaseModel):
+    run_id: str
+    state: str | None = None  # running, completed, failed (None: expired)
+    started_at: datetime | None = None
+    updated_at: datetime | None = None
+    keys: int = 0  # batches written by the run that still exist
+    size: int = 0  # their size in bytes
+
+    @property
+    def is_orphaned(self) -> bool:
+        if self.state in (None, "failed"):
+            return True
+        if self.state == "running" and self.updated_at is not None:
+            age = (datetime.utcnow() - self.updated_at).total_seconds()
+            return age > SETTINGS.cache_run_timeout
+        return False
+
+
 class Cache:
     """
     This is an extremely simple cache interface for sharing tasks data
-    efficiently via redis (or fakeredis during development)
+    efficiently via redis (or fakeredis during development, or a local disk
+    spool for large single-node runs)
 
-    it creates (prefixed) keys based on input data
+    it creates (prefixed) keys based on a fingerprint of the serialized data
 
-    it mimics redis GETDEL so that after fetching data from cache the key is
+    it uses redis GETDEL so that after fetching data from cache the key is
     deleted (turn of by `delete=False`)
-    """
 
-    serializer = RedisSerializer()
+    a cache bound to a run (see `bind`) records every key it writes in a
+    per-run index, so that batches of failed or cancelled runs can be found
+    and evicted later (`investigraph cache gc`)
+    """
 
     def __init__(self):
-        if SETTINGS.debug or not SETTINGS.redis:
+        self.serializer = get_serializer()
+        self.can_getdel = True
+        self.is_redis = False
+        self.run_id: str | None = None
+        self.sizes: dict[str, int] = {}  # bytes per key written in this process
+        if SETTINGS.spool:
+            con = Spool(SETTINGS.spool_path or SETTINGS.data_root / "spool.db")
+            con.ping()
+            log.info(f"Spool connected: `{con.path}`")
+        elif SETTINGS.debug or not SETTINGS.redis:
             con = fakeredis.FakeStrictRedis()
             con.ping()
             log.info("Redis connected: `fakeredis`")
         else:
-            con = redis.from_url(str(SETTINGS.redis_url))
+            pool = redis.ConnectionPool.from_url(
+                str(SETTINGS.redis_url),
+                max_connections=SETTINGS.redis_max_connections,
+            )
+            con = redis.Redis(connection_pool=pool)
             con.ping()
-            log.info("Redis connected: `{settings.REDIS_URL}`")
+            self.is_redis = True
+            log.info(f"Redis connected: `{SETTINGS.redis_url}`")
         self.cache = con
 
-    def set(self, data: Any, key: str | None = None) -> str:
-        key = key or make_data_checksum(data)
+    @property
+    def is_shared(self) -> bool:
+        """
+        If other processes (on this or other nodes) see the same data
+        """
+        return self.is_redis or isinstance(self.cache, Spool)
+
+    def bind(self, run_id: str) -> "Cache":
+        """
+        Get a cache (sharing the connection) that records its keys for the run
+        """
+        cache = copy.copy(self)
+        cache.run_id = run_id
+        return cache
+
+    def _write(self, pipe: Any, key: str, data: bytes) -> None:
+        pipe.set(self.get_key(key), data, ex=SETTINGS.cache_ttl)
+        self.sizes[key] = len(data)
+        if self.run_id is not None:
+            pipe.sadd(self.get_run_key(self.run_id, "SET"), key)
+            if SETTINGS.cache_ttl:
+                pipe.expire(self.get_run_key(self.run_id, "SET"), SETTINGS.cache_ttl)
+                pipe.expire(self.get_run_key(self.run_id), SETTINGS.cache_ttl)
+
+    def set(self, data: Any, key: str | None = None, prefix: str | None = None) -> str:
+        """
+        Store data, the key (if not given) is `<prefix>#<fingerprint>` with the
+        fingerprint computed from the serialized payload
+        """
         data = self.serializer.dumps(data)
-        self.cache.set(self.get_key(key), data)
+        key = key or self.make_key(data, prefix)
+        if self.run_id is None:
+            self.cache.set(self.get_key(key), data, ex=SETTINGS.cache_ttl)
+            self.sizes[key] = len(data)
+        else:
+            pipe = self.cache.pipeline(transaction=False)
+            self._write(pipe, key, data)
+            pipe.execute()
         return key
 
     def get(self, key: str, delete: bool | None = DELETE) -> Any:
+        if delete:
+            self.sizes.pop(key, None)
         key = self.get_key(key)
-        res = self.cache.get(key)
         if delete:
-            self.cache.delete(key)  # GETDEL
+            res = self._getdel(key)
+        else:
+            res = self.cache.get(key)
+        get_metrics().cache_hit(res is not None)
         if res is not None:
             data = self.serializer.loads(res)
             return data
 
+    def delete(self, *keys: str) -> int:
+        if not keys:
+            return 0
+        for key in keys:
+            self.sizes.pop(key, None)
+        return self.cache.delete(*[self.get_key(k) for k in keys])
+
+    def exists(self, *keys: str) -> int:
+        """
+        Number of the given keys that exist
+        """
+        if not keys:
+            return 0
+        return self.cache.exists(*[self.get_key(k) for k in keys])
+
+    def _getdel(self, key: str) -> bytes | None:
+        if self.can_getdel:
+            try:
+                return self.cache.getdel(key)
+            except redis.exceptions.ResponseError:  # redis < 6.2
+                self.can_getdel = False
+        pipe = self.cache.pipeline(transaction=True)
+        pipe.get(key)
+        pipe.delete(key)
+        res, _ = pipe.execute()
+        return res
+
     def sadd(self, *values: Iterable[Any], key: str | None = None) -> str:
         values = [str(v) for v in values]
         key = key or make_data_checksum(values)
@@ -61,19 +274,171 @@ class Cache:
 
     def smembers(self, key: str, delete: bool | None = DELETE) -> Set[str]:
         key = self.get_key(key) + "#SET"
-        res: Set[bytes] = self.cache.smembers(key)
         if delete:
-            self.cache.delete(key)
+            pipe = self.cache.pipeline(transaction=True)
+            pipe.smembers(key)
+            pipe.delete(key)
+            res, _ = pipe.execute()
+        else:
+            res = self.cache.smembers(key)
         return {v.decode() for v in res} or None
 
     def flushall(self):
+        self.sizes.clear()
         return self.cache.flushall()
 
+    def memory_usage(self) -> int:
+        """
+        Used memory of the redis server, or the size of the batches this
+        process has written and that weren't consumed yet
+        """
+        if self.is_redis:
+            return self.cache.info("memory")["used_memory"]
+        return sum(self.sizes.values())
+
+    def throttle(self) -> None:
+        """
+        Block (up to `SETTINGS.cache_throttle_timeout` seconds) while the cache
+        uses more memory than `SETTINGS.cache_max_memory`
+        """
+        if not SETTINGS.cache_max_memory or not DELETE:
+            # persisted batches are never consumed, waiting wouldn't help
+            return
+        start = time.monotonic()
+        while self.memory_usage() > SETTINGS.cache_max_memory:
+            if time.monotonic() - start > SETTINGS.cache_throttle_timeout:
+                log.warning(
+                    "Cache memory budget (%d bytes) still exceeded after %ds"
+                    % (SETTINGS.cache_max_memory, SETTINGS.cache_throttle_timeout)
+                )
+                return
+            time.sleep(0.1)
+
+    def set_run_state(self, state: str) -> None:
+        if self.run_id is None:
+            return
+        key = self.get_run_key(self.run_id)
+        now = datetime.utcnow().isoformat()
+        data = orjson.loads(self.cache.get(key) or b"{}")
+        data.update(state=state, updated_at=now)
+        data.setdefault("started_at", now)
+        self.cache.set(key, orjson.dumps(data), ex=SETTINGS.cache_ttl)
+
+    @contextmanager
+    def heartbeat(self) -> Generator[None, None, None]:
+        """
+        Refresh the marker of the bound run every `SETTINGS.cache_run_heartbeat`
+        seconds, so that long runs are not taken for orphans
+        """
+        if self.run_id is None:
+            yield
+            return
+        stop = threading.Event()
+
+        def beat() -> None:
+            while not stop.wait(SETTINGS.cache_run_heartbeat):
+                try:
+                    self.set_run_state("running")
+                except Exception as e:
+                    log.warning(f"Run heartbeat failed: {e}")
+
+        thread = threading.Thread(
+            target=beat, name="investigraph-heartbeat", daemon=True
+        )
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    @contextmanager
+    def track_run(self) -> Generator[None, None, None]:
+        """
+        Mark the bound run as running (with a heartbeat), and as completed or
+        failed afterwards
+        """
+        self.set_run_state("running")
+        try:
+            with self.heartbeat():
+                yield
+        except BaseException:
+            self.set_run_state("failed")
+            raise
+        self.set_run_state("completed")
+
+    def get_run_keys(self, run_id: str) -> Set[str]:
+        res = self.cache.smembers(self.get_run_key(run_id, "SET"))
+        return {v.decode() for v in res}
+
+    def get_runs(self) -> list[RunInfo]:
+        """
+        Get all runs that wrote batches (and their remaining keys and size)
+        """
+        run_ids: set[str] = set()
+        prefix = self.get_run_key("")
+        for key in self.cache.scan_iter(match=f"{prefix}*"):
+            run_id = key.decode()[len(prefix) :]
+            run_ids.add(run_id.removesuffix("#SET"))
+        runs = []
+        for run_id in sorted(run_ids):
+            data = orjson.loads(self.cache.get(self.get_run_key(run_id)) or b"{}")
+            keys = [self.get_key(k) for k in self.get_run_keys(run_id)]
+            pipe = self.cache.pipeline(transaction=False)
+            for key in keys:
+                pipe.strlen(key)
+            sizes = [s for s in pipe.execute() if s] if keys else []
+            runs.append(
+                RunInfo(run_id=run_id, keys=len(sizes), size=sum(sizes), **data)
+            )
+        return runs
+
+    def evict_runs(self, run_ids: Iterable[str]) -> int:
+        """
+        Delete the batches and markers of the given runs, keys that are shared
+        with other runs are kept. Returns the number of deleted batches.
+        """
+        run_ids = set(run_ids)
+        keep: set[str] = set()
+        for run in self.get_runs():
+            if run.run_id not in run_ids:
+                keep.update(self.get_run_keys(run.run_id))
+        deleted = 0
+        for run_id in run_ids:
+            keys = self.get_run_keys(run_id) - keep
+            if keys:
+                deleted += self.cache.delete(*[self.get_key(k) for k in keys])
+            for key in keys:
+                self.sizes.pop(key, None)
+            self.cache.delete(self.get_run_key(run_id), self.get_run_key(run_id, "SET"))
+        return deleted
+
+    @staticmethod
+    def make_key(payload: bytes, prefix: str | None = None) -> str:
+        # hashing the already serialized bytes is much cheaper than
+        # `make_data_checksum` which would serialize the data a second time
+        key = hashlib.sha1(payload).hexdigest()
+        if prefix:
+            return f"{prefix}#{key}"
+        return key
+
     @staticmethod
     def get_key(key: str) -> str:
         return f"{SETTINGS.redis_prefix}:{key}"
 
+    @staticmethod
+    def get_run_key(run_id: str, suffix: str | None = None) -> str:
+        key = f"{SETTINGS.redis_prefix}:RUN#{run_id}"
+        if suffix:
+            return f"{key}#{suffix}"
+        return key
+
 
 @cache
 def get_cache() -> Cache:
     return Cache()
+
+
+@cache
+def get_run_cache(run_id: str) -> Cache:
+    return get_cache().bind(run_id)
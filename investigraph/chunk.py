@@ -0,0 +1,99 @@
+"""
+Adaptive batch sizes: size the extract batches of a source from the observed
+(serialized) record sizes and transform durations to hit a target byte size or
+processing time per batch
+"""
+
+import threading
+
+from investigraph.model.context import Context
+from investigraph.settings import SETTINGS
+
+MIN_SIZE = 10
+MAX_SIZE = 1_000_000
+SMOOTHING = 0.5  # weight of a new observation
+
+
+class ChunkSizer:
+    def __init__(
+        self,
+        size: int,
+        target_bytes: int | None = None,
+        target_seconds: float | None = None,
+    ) -> None:
+        self.size = size
+        self.target_bytes = target_bytes
+        self.target_seconds = target_seconds
+        self.bytes_per_record: float | None = None
+        self.seconds_per_record: float | None = None
+        self.sizes: list[int] = []
+        self.lock = threading.Lock()
+
+    @property
+    def is_adaptive(self) -> bool:
+        return bool(self.target_bytes or self.target_seconds)
+
+    def observe_bytes(self, records: int, size: int) -> None:
+        if self.target_bytes and records and size:
+            with self.lock:
+                self.bytes_per_record = self.smooth(
+                    self.bytes_per_record, size / records
+                )
+                self.update()
+
+    def observe_seconds(self, records: int, seconds: float) -> None:
+        if self.target_seconds and records:
+            with self.lock:
+                self.seconds_per_record = self.smooth(
+                    self.seconds_per_record, seconds / records
+                )
+                self.update()
+
+    def add(self, size: int) -> None:
+        self.sizes.append(size)
+
+    def update(self) -> None:
+        candidates = []
+        if self.target_bytes and self.bytes_per_record:
+            candidates.append(self.target_bytes / self.bytes_per_record)
+        if self.target_seconds and self.seconds_per_record:
+            candidates.append(self.target_seconds / self.seconds_per_record)
+        if candidates:
+            self.size = int(max(MIN_SIZE, min(MAX_SIZE, *candidates)))
+
+    def get_summary(self) -> str:
+        if not self.sizes:
+            return "no batches"
+        return "%d batches of %d-%d records (avg %d)" % (
+            len(self.sizes),
+            min(self.sizes),
+            max(self.sizes),
+            sum(self.sizes) / len(self.sizes),
+        )
+
+    @staticmethod
+    def smooth(current: float | None, value: float) -> float:
+        if current is None:
+            return value
+        return SMOOTHING * value + (1 - SMOOTHING) * current
+
+
+_sizers: dict[tuple[str | None, str], ChunkSizer] = {}
+_lock = threading.Lock()
+
+
+def get_sizer(ctx: Context) -> ChunkSizer:
+    key = (ctx.run_id, ctx.source.uri)
+    with _lock:
+        if key not in _sizers:
+            _sizers[key] = ChunkSizer(
+                ctx.config.transform.chunk_size,
+                target_bytes=SETTINGS.chunk_target_bytes,
+                target_seconds=SETTINGS.chunk_target_seconds,
+            )
+        return _sizers[key]
+
+
+def clear_sizers() -> None:
+    with _lock:
+        _sizers.clear()
@@ -1,4 +1,6 @@
+import logging
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Annotated, Optional
 
@@ -10,20 +12,46 @@ from rich import print
 from rich.console import Console
 from rich.table import Table
 
+from investigraph.cache import get_cache
 from investigraph.inspect import (
     inspect_config,
     inspect_extract,
     inspect_seed,
     inspect_transform,
 )
+from investigraph.model.config import Config, get_config
 from investigraph.model.flow import FlowOptions
-from investigraph.pipeline import run
+from investigraph.pipeline import merge, run, run_local
+from investigraph.profile import get_profile_path, profiling
 from investigraph.settings import SETTINGS, VERSION
 
 cli = typer.Typer(no_args_is_help=True)
+cache_cli = typer.Typer(no_args_is_help=True, help="Manage the batch cache")
+cli.add_typer(cache_cli, name="cache")
 console = Console()
 
 
+def execute(options: FlowOptions, executor: str | None = SETTINGS.executor) -> None:
+    if executor == "local":
+        logging.basicConfig(level=logging.INFO)
+        run_local(options, SETTINGS.local_workers)
+    elif executor == "prefect":
+        run(options)
+    else:
+        raise typer.BadParameter(f"Unknown executor: `{executor}`")
+
+
+@contextmanager
+def maybe_profile(dataset: str, profile: bool | None = False):
+    if not profile:
+        yield
+        return
+    path = get_profile_path(dataset)
+    with profiling(path):
+        yield
+    print(f"[bold green]OK[/bold green] profiles written to `{path}`", file=sys.stderr)
+
+
 @cli.callback(invoke_without_command=True)
 def cli_version(
     version: Annotated[Optional[bool], typer.Option(..., help="Show version")] = False
@@ -44,6 +72,40 @@ def cli_run(
     entities_uri: Annotated[Optional[str], typer.Option(...)] = None,
     aggregate: Annotated[Optional[bool], typer.Option(...)] = True,
     chunk_size: Annotated[Optional[int], typer.Option(...)] = SETTINGS.chunk_size,
+    incremental: Annotated[
+        Optional[bool],
+        typer.Option(..., help="Only process new or changed sources"),
+    ] = False,
+    shard: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help="Only process the i-th of n partitions of the sources (`i/n`), "
+            "aggregate them afterwards with `investigraph merge`",
+        ),
+    ] = None,
+    resume: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help="Resume the failed run with this id, skipping its loaded batches",
+        ),
+    ] = None,
+    executor: Annotated[
+        Optional[str],
+        typer.Option(
+            ...,
+            help="`prefect` or `local` (a thread pool without the prefect engine)",
+        ),
+    ] = SETTINGS.executor,
+    profile: Annotated[
+        Optional[bool],
+        typer.Option(
+            ...,
+            help="Profile the stage handlers, write pstats and collapsed stacks "
+            "per stage to the `profile` folder of the dataset",
+        ),
+    ] = False,
 ):
     """
     Execute a dataset pipeline
@@ -55,8 +117,37 @@ def cli_run(
         entities_uri=entities_uri,
         aggregate=aggregate,
         chunk_size=chunk_size,
+        incremental=incremental,
+        shard=shard,
+        resume=resume,
     )
-    run(options)
+    with maybe_profile(get_config(config).dataset.name, profile):
+        execute(options, executor)
+
+
+@cli.command("merge")
+def cli_merge(
+    config: Annotated[
+        str,
+        typer.Option("-c", help="Any local or remote json or yaml uri"),
+    ],
+    shards: Annotated[int, typer.Option(..., help="Number of shards")],
+    index_uri: Annotated[Optional[str], typer.Option(...)] = None,
+    fragments_uri: Annotated[Optional[str], typer.Option(...)] = None,
+    entities_uri: Annotated[Optional[str], typer.Option(...)] = None,
+    chunk_size: Annotated[Optional[int], typer.Option(...)] = SETTINGS.chunk_size,
+):
+    """
+    Aggregate the fragments of all shards of a sharded dataset pipeline run
+    """
+    options = FlowOptions(
+        config=config,
+        index_uri=index_uri,
+        fragments_uri=fragments_uri,
+        entities_uri=entities_uri,
+        chunk_size=chunk_size,
+    )
+    merge(options, shards)
 
 
 @cli.command("extract")
@@ -74,7 +165,7 @@ def cli_extract(
     options = FlowOptions(
         config=config, chunk_size=chunk_size, records_uri=uri, extract_only=True
     )
-    run(options)
+    execute(options)
 
 
 @cli.command("inspect")
@@ -94,6 +185,14 @@ def cli_inspect(
             help="Comma separated list of column names or ix to display",
         ),
     ] = None,
+    profile: Annotated[
+        Optional[bool],
+        typer.Option(
+            ...,
+            help="Profile the stage handlers, write pstats and collapsed stacks "
+            "per stage to the `profile` folder of the dataset",
+        ),
+    ] = False,
 ):
     config = inspect_config(config_path)
     if not to_json and not to_csv:
@@ -101,6 +200,20 @@ def cli_inspect(
         print(f"[bold]dataset:[/bold] {config.dataset.name}")
         print(f"[bold]title:[/bold] {config.dataset.title}")
 
+    with maybe_profile(config.dataset.name, profile):
+        run_inspect(config, seed, extract, transform, limit, to_csv, to_json, usecols)
+
+
+def run_inspect(
+    config: Config,
+    seed: bool | None = False,
+    extract: bool | None = False,
+    transform: bool | None = False,
+    limit: int | None = 5,
+    to_csv: bool | None = False,
+    to_json: bool | None = False,
+    usecols: str | None = None,
+) -> None:
     if seed:
         df = inspect_seed(config, limit)
         if usecols:
@@ -169,6 +282,53 @@ def cli_catalog(
     smart_write(out_uri, data.encode())
 
 
+@cache_cli.command("gc")
+def cli_cache_gc(
+    run_id: Annotated[
+        Optional[list[str]],
+        typer.Option(..., help="Evict the batches of this run (repeatable)"),
+    ] = None,
+    all: Annotated[
+        Optional[bool], typer.Option(..., help="Evict batches of completed runs too")
+    ] = False,
+    dry_run: Annotated[
+        Optional[bool], typer.Option(..., help="Only report, don't evict")
+    ] = False,
+):
+    """
+    Report batches left in the cache per run and evict the ones of orphaned
+    (failed, cancelled or expired) runs
+    """
+    cache = get_cache()
+    runs = cache.get_runs()
+    if run_id:
+        evict = [r for r in runs if r.run_id in run_id]
+    elif all:
+        evict = [r for r in runs if r.state != "running" or r.is_orphaned]
+    else:
+        evict = [r for r in runs if r.is_orphaned]
+    evict_ids = {r.run_id for r in evict}
+
+    table = Table("run id", "state", "started", "batches", "bytes", "action")
+    for info in runs:
+        table.add_row(
+            info.run_id,
+            info.state or "expired",
+            str(info.started_at or ""),
+            str(info.keys),
+            str(info.size),
+            "evict" if info.run_id in evict_ids else "keep",
+        )
+    console.print(table)
+
+    if evict_ids and not dry_run:
+        deleted = cache.evict_runs(evict_ids)
+        print(
+            f"[bold green]OK[/bold green] evicted {deleted} batches "
+            f"of {len(evict_ids)} runs"
+        )
+
+
 @cli.command("config")
 def cli_config(
     out_uri: Annotated[str, typer.Option("-o")] = "-",
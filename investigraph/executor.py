@@ -0,0 +1,88 @@
+"""
+Submit pipeline tasks either to the prefect task runner, or (for small
+datasets and cron jobs) to a local thread pool that calls the plain task
+functions without the prefect engine, its api database, task run records and
+result persistence
+"""
+
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, TypeAlias
+
+from prefect import Task
+from prefect.futures import PrefectFuture
+
+log = logging.getLogger(__name__)
+
+TaskFuture: TypeAlias = PrefectFuture | Future
+
+
+class PrefectExecutor:
+    subflows = True
+
+    def submit(self, task: Task, *args, **kwargs) -> PrefectFuture:
+        return task.submit(*args, **kwargs)
+
+    def wait(self, future: PrefectFuture) -> None:
+        future.wait()
+
+    def shutdown(self) -> None:
+        pass
+
+
+class LocalExecutor:
+    """
+    Run tasks in a thread pool, futures passed as arguments are resolved
+    before the task is called (like prefect does). Retries follow the task
+    settings, there is no task caching.
+    """
+
+    subflows = False
+
+    def __init__(self, workers: int | None = None) -> None:
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="investigraph")
+
+    def submit(self, task: Task, *args, **kwargs) -> Future:
+        return self.pool.submit(self.call, task, *args, **kwargs)
+
+    def wait(self, future: Future) -> None:
+        wait([future])
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=True)
+
+    @staticmethod
+    def call(task: Task, *args, **kwargs) -> Any:
+        args = [resolve(a) for a in args]
+        kwargs = {k: resolve(v) for k, v in kwargs.items()}
+        attempt = 0
+        while True:
+            try:
+                return task.fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= (task.retries or 0):
+                    raise
+                delay = get_retry_delay(task, attempt)
+                attempt += 1
+                log.warning(
+                    f"Task `{task.name}` failed ({e.__class__.__name__}: {e}), "
+                    f"retry {attempt}/{task.retries} in {delay}s ..."
+                )
+                time.sleep(delay)
+
+
+def resolve(value: Any) -> Any:
+    if isinstance(value, Future):
+        return value.result()
+    return value
+
+
+def get_retry_delay(task: Task, attempt: int) -> float:
+    delay = task.retry_delay_seconds or 0
+    if isinstance(delay, list):
+        return delay[min(attempt, len(delay) - 1)]
+    return delay
+
+
+Executor: TypeAlias = PrefectExecutor | LocalExecutor
@@ -2,7 +2,10 @@
 aggregate fragments
 """
 
-from typing import TYPE_CHECKING, Literal, TypeAlias
+import os
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Generator, Iterable, Literal, TypeAlias
 from urllib.parse import urlparse
 from uuid import uuid4
 
@@ -16,8 +19,9 @@ from ftmstore import get_dataset
 
 if TYPE_CHECKING:
     from investigraph.model import Context
+    from investigraph.model.context import BaseContext
 
-from investigraph.types import CEGenerator
+from investigraph.types import CEGenerator, SDict
 
 AggregatorResult: TypeAlias = tuple[int, DatasetStats]
 
@@ -89,6 +93,106 @@ class Aggregator:
             yield proxy
 
 
+class StreamingBuffer:
+    """
+    Merge proxies into the aggregation buffer while their fragment parts are
+    loaded, so that aggregation doesn't need to read them again
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.proxies: dict[str, CE] = {}
+        self.parts: set[str] = set()
+        self.fragments = 0
+
+    def _put(self, proxy: CE) -> None:
+        if proxy.id in self.proxies:
+            self.proxies[proxy.id] = merge(
+                self.proxies[proxy.id], proxy, downgrade=True
+            )
+        else:
+            self.proxies[proxy.id] = proxy
+        self.fragments += 1
+
+    def put(self, proxy: CE | SDict) -> None:
+        if isinstance(proxy, dict):
+            proxy = make_proxy(proxy)
+        with self.lock:
+            self._put(proxy)
+
+    def add_part(self, uri: str, proxies: Iterable[CE | SDict]) -> None:
+        """
+        Merge the proxies of a loaded fragment part, only once per part (a
+        retried load task must not count them again)
+        """
+        proxies = [make_proxy(p) if isinstance(p, dict) else p for p in proxies]
+        with self.lock:
+            if uri in self.parts:
+                return
+            for proxy in proxies:
+                self._put(proxy)
+            self.parts.add(uri)
+
+
+_buffers: dict[str, StreamingBuffer] = {}
+_buffers_lock = threading.Lock()
+
+
+def get_buffer_key(ctx: "BaseContext") -> str:
+    return ctx.run_id or ctx.dataset
+
+
+def is_buffering(ctx: "BaseContext") -> bool:
+    """
+    Streaming aggregation is configured (and fragments are not loaded into a
+    store)
+    """
+    if not ctx.config.aggregate or not ctx.config.aggregate.is_streaming:
+        return False
+    return "sql" not in urlparse(ctx.config.load.fragments_uri).scheme
+
+
+@contextmanager
+def buffering(ctx: "BaseContext") -> Generator[None, None, None]:
+    """
+    Keep the streaming buffer of a run in this (the flow) process for the
+    duration of the run, and release it in any case afterwards (e.g. failed
+    runs or a cached aggregation)
+    """
+    if not is_buffering(ctx):
+        yield
+        return
+    key = get_buffer_key(ctx)
+    with _buffers_lock:
+        _buffers[key] = StreamingBuffer()
+    try:
+        yield
+    finally:
+        with _buffers_lock:
+            _buffers.pop(key, None)
+
+
+def get_buffer(ctx: "BaseContext") -> StreamingBuffer | None:
+    """
+    Get the streaming buffer of the current run, if it lives in this process
+    (tasks running in other processes load their fragments as usual, the
+    aggregation reads them from there)
+    """
+    with _buffers_lock:
+        buffer = _buffers.get(get_buffer_key(ctx))
+    if buffer is not None and buffer.pid == os.getpid():
+        return buffer
+
+
+def pop_buffer(ctx: "BaseContext") -> StreamingBuffer:
+    with _buffers_lock:
+        buffer = _buffers.pop(get_buffer_key(ctx), None)
+    if buffer is not None and buffer.pid == os.getpid():
+        return buffer
+    return StreamingBuffer()
+
+
 def in_memory(ctx: "Context", fragment_uris: list[str]) -> AggregatorResult:
     aggregator = Aggregator(ctx, fragment_uris)
     collector = Collector()
@@ -103,3 +207,27 @@ def in_db(ctx: "Context", fragment_uris: list[str]) -> AggregatorResult:
     proxies = aggregator.iterate(collector, "db")
     ctx.load_entities(proxies, serialize=True)
     return aggregator.fragments, collector.export()
+
+
+def streaming(ctx: "Context", fragment_uris: list[str]) -> AggregatorResult:
+    """
+    Aggregate the proxies the load stage streamed into the buffer of this run
+    and only read the fragment parts that aren't in there (e.g. loaded by
+    other processes or re-used from a previous run)
+    """
+    buffer = pop_buffer(ctx)
+    missing = [uri for uri in fragment_uris if uri not in buffer.parts]
+    if missing:
+        ctx.log.info("reading %d fragment parts not in memory ..." % len(missing))
+        aggregator = Aggregator(ctx, missing)
+        for proxy in aggregator.get_fragments():
+            buffer.put(proxy)
+    collector = Collector()
+
+    def proxies() -> CEGenerator:
+        for proxy in buffer.proxies.values():
+            collector.collect(proxy)
+            yield proxy
+
+    ctx.load_entities(proxies(), serialize=True)
+    return buffer.fragments, collector.export()
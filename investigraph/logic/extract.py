@@ -2,7 +2,6 @@
 Extract sources to iterate objects to dict records
 """
 
-import numpy as np
 import pandas as pd
 from pantomime import types
 from runpandarun.io import guess_handler_from_mimetype
@@ -16,8 +15,18 @@ JSON = types.JSON
 
 
 def yield_pandas(df: pd.DataFrame) -> RecordGenerator:
-    for _, row in df.iterrows():
-        yield dict(row.replace(np.nan, None))
+    """
+    Emit the rows of a data frame as plain dict records with all missing values
+    (`nan`, `NaT`, ...) replaced by `None`. The cleanup is done once for the
+    whole (chunked) data frame instead of per row.
+    """
+    if df.dtypes.nunique() > 1:
+        # like the rows of `DataFrame.iterrows`, values are upcast to the
+        # common dtype of all columns (e.g. ints to floats in an all-numeric
+        # frame), so that stringified values and ids stay the same
+        df = pd.DataFrame(df.to_numpy(), index=df.index, columns=df.columns)
+    df = df.astype(object).where(df.notna(), None)
+    yield from df.to_dict("records")
 
 
 def extract_pandas(
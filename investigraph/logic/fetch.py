@@ -2,19 +2,26 @@
 Cache remote file file fetching using `anystore`
 """
 
+import hashlib
 import random
+import threading
 import time
-from io import BytesIO
+from pathlib import Path
+from typing import Any
 
 import requests
 from anystore import anycache, get_store
 from anystore.settings import Settings
 from anystore.store import BaseStore
-from anystore.util import make_checksum, make_data_checksum
+from anystore.util import make_data_checksum
+from fsspec.core import url_to_fs
+from fsspec.implementations.local import LocalFileSystem
 
 from investigraph.logging import get_logger
 from investigraph.model.source import Source
+from investigraph.session import get_session, get_stats
 from investigraph.settings import SETTINGS
+from investigraph.util import ensure_path
 
 
 def get_anystore() -> BaseStore:
@@ -25,6 +32,34 @@ def get_anystore() -> BaseStore:
 
 STORE = get_anystore()
 ARCHIVE_STORE = get_store(uri=SETTINGS.archive_uri)
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+# a chunk is written once it is complete, a broken transfer loses at most this
+DOWNLOAD_CHUNK_SIZE = 16 * 1024
+
+_locks: dict[str, threading.Lock] = {}
+_locks_lock = threading.Lock()
+
+
+def get_archive_uri(key: str) -> str:
+    return f"{SETTINGS.archive_uri.rstrip('/')}/{key}"
+
+
+def prepare_request(
+    stealthy: bool | None = False, delay: int | None = None, **kwargs
+) -> dict[str, Any]:
+    if stealthy:
+        kwargs["headers"] = kwargs.pop("headers", {})
+        kwargs["headers"]["User-Agent"] = random.choice(AGENTS)
+    if delay is not None:
+        time.sleep(delay)
+    kwargs["timeout"] = kwargs.pop("timeout", 30)
+    return kwargs
+
+
+def get_url_key(url: str, *args, **kwargs) -> str:
+    for key in ("cache", "stream", "url_key_only", "delay", "stealthy", "timeout"):
+        kwargs.pop(key, None)
+    return make_data_checksum((url, *args, kwargs))
 
 
 def get_cache_key(url: str, *args, **kwargs) -> str | None:
@@ -37,13 +72,18 @@ def get_cache_key(url: str, *args, **kwargs) -> str | None:
         head = source.head()
         if head.ckey:
             return make_data_checksum((url, head.ckey, *args, kwargs))
-    kwargs.pop("delay", None)
-    kwargs.pop("stealthy", None)
-    kwargs.pop("timeout", None)
-    return make_data_checksum((url, *args, kwargs))
+    return get_url_key(url, *args, **kwargs)
+
+
+def get_validators(res: requests.Response) -> dict[str, str]:
+    headers = {}
+    if res.headers.get("ETag"):
+        headers["If-None-Match"] = res.headers["ETag"]
+    if res.headers.get("Last-Modified"):
+        headers["If-Modified-Since"] = res.headers["Last-Modified"]
+    return headers
 
 
-@anycache(key_func=get_cache_key, store=STORE)
 def get(
     url: str,
     *args,
@@ -54,24 +94,74 @@ def get(
     raise_on_error: bool | None = True,
     **kwargs,
 ) -> requests.Response:
-    if stealthy:
-        kwargs["headers"] = kwargs.pop("headers", {})
-        kwargs["headers"]["User-Agent"] = random.choice(AGENTS)
-    if delay is not None:
-        time.sleep(delay)
-    kwargs["timeout"] = kwargs.pop("timeout", 30)
+    """
+    GET `url` and cache the response. A cached response is revalidated with
+    its validators (`ETag`, `Last-Modified`), a `304 Not Modified` answer
+    serves it from the cache without transferring the body again.
+    `url_key_only` serves cached responses without revalidation.
+    """
+    stats = get_stats()
     log = get_logger(__name__)
+    key = None
+    cached = None
+    if cache and not kwargs.get("stream"):
+        key = get_url_key(url, *args, **kwargs)
+        # anystore can't unpickle the `None` of a missing key
+        if STORE.exists(key):
+            cached = STORE.get(key, serialization_mode="pickle")
+
+    kwargs = prepare_request(stealthy, delay, **kwargs)
+    if cached is not None:
+        validators = get_validators(cached)
+        if url_key_only or not validators:
+            stats["get_hit"] += 1
+            return cached
+        kwargs["headers"] = {**(kwargs.pop("headers", None) or {}), **validators}
+
     log.info(f"GET {url}")
-    res = requests.get(url, *args, **kwargs)
+    res = get_session().get(url, *args, **kwargs)
+    if cached is not None and res.status_code == 304:
+        stats["get_304"] += 1
+        return cached
+    stats["get_miss"] += 1
+    if not kwargs.get("stream"):
+        stats["get_bytes"] += len(res.content)
     try:
         res.raise_for_status()
     except requests.exceptions.RequestException as e:
         if raise_on_error:
             raise e
         log.error(str(e))
+    if key is not None and res.ok:
+        STORE.put(key, res, serialization_mode="pickle")
     return res
 
 
+def is_partial_response(res: requests.Response, offset: int) -> bool:
+    content_range = res.headers.get("Content-Range", "")
+    return res.status_code == 206 and content_range.startswith(f"bytes {offset}-")
+
+
+def get_range_validator(res: requests.Response) -> str | None:
+    # weak etags are not allowed in `If-Range`
+    etag = res.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return res.headers.get("Last-Modified")
+
+
+def get_partial_path(url: str) -> Path:
+    # outside of the archive, so that partial files never show up as its keys
+    return ensure_path(SETTINGS.data_root / ".partial") / make_data_checksum(url)
+
+
+def get_download_lock(url: str) -> threading.Lock:
+    with _locks_lock:
+        if url not in _locks:
+            _locks[url] = threading.Lock()
+        return _locks[url]
+
+
 @anycache(key_func=get_cache_key, store=STORE)
 def download_file(
     url: str,
@@ -83,16 +173,70 @@ def download_file(
     raise_on_error: bool | None = True,
     **kwargs,
 ) -> str:
-    res = get(
-        url,
-        cache=False,
-        stealthy=stealthy,
-        delay=delay,
-        raise_on_error=raise_on_error,
-        **kwargs,
-    )
-    key = key or make_checksum(BytesIO(res.content))
-    ARCHIVE_STORE.put(key, res.content)
+    """
+    Stream the response body of `url` into the archive store while computing
+    its checksum (the default key) on the fly, so that the body is never held
+    in memory. Interrupted downloads are resumed via http range requests the
+    next time, if the resource didn't change in between (`If-Range`).
+    """
+    kwargs = prepare_request(stealthy, delay, **kwargs)
+    kwargs["headers"] = dict(kwargs.pop("headers", None) or {})
+    partial = get_partial_path(url)
+    validator_path = partial.with_suffix(".validator")
+    log = get_logger(__name__)
+
+    with get_download_lock(url):
+        # resume from already downloaded bytes of the same resource
+        digest = hashlib.sha1()
+        offset = 0
+        if partial.exists() and validator_path.exists():
+            with open(partial, "rb") as fh:
+                for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    offset += len(chunk)
+        if offset:
+            kwargs["headers"]["Range"] = f"bytes={offset}-"
+            kwargs["headers"]["If-Range"] = validator_path.read_text()
+
+        log.info(f"GET {url}" + (f" (resume at {offset} bytes)" if offset else ""))
+        res = get_session().get(url, stream=True, **kwargs)
+        if offset and not is_partial_response(res, offset):
+            # server doesn't support ranges (or content changed), start over
+            res.close()
+            kwargs["headers"].pop("Range")
+            kwargs["headers"].pop("If-Range")
+            digest = hashlib.sha1()
+            offset = 0
+            res = get_session().get(url, stream=True, **kwargs)
+        with res:
+            try:
+                res.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                if raise_on_error:
+                    raise e
+                log.error(str(e))
+            if not offset:
+                # remember the version of the resource this transfer is for
+                validator = get_range_validator(res)
+                if validator:
+                    validator_path.write_text(validator)
+                else:
+                    validator_path.unlink(missing_ok=True)
+            with open(partial, "ab" if offset else "wb") as fh:
+                for chunk in res.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    digest.update(chunk)
+                    fh.write(chunk)
+                    get_stats()["get_bytes"] += len(chunk)
+
+        key = key or digest.hexdigest()
+        fs, root = url_to_fs(SETTINGS.archive_uri)
+        if isinstance(fs, LocalFileSystem):
+            fs.makedirs(root, exist_ok=True)
+            fs.mv(str(partial), f"{root}/{key}")
+        else:
+            fs.put(str(partial), f"{root}/{key}")
+            partial.unlink()
+        validator_path.unlink(missing_ok=True)
     return key
 
 
@@ -0,0 +1,102 @@
+"""
+Prefetch remote sources into the archive concurrently, so that extraction of a
+source doesn't have to wait for its download round-trips: the resolver reads
+the archived copy and its HEAD request is served by the head cache
+"""
+
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Generator, Iterable
+from urllib.parse import urlparse
+
+from investigraph.logic import fetch
+from investigraph.model.context import Context
+from investigraph.model.source import Source
+from investigraph.settings import SETTINGS
+
+log = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """
+    Download sources in a thread pool (global limit) while allowing only
+    `per_host` concurrent downloads for the same host
+    """
+
+    def __init__(self, workers: int, per_host: int) -> None:
+        self.workers = workers
+        self.per_host = per_host
+        self.executor = ThreadPoolExecutor(
+            workers, thread_name_prefix="investigraph-prefetch"
+        )
+        self.lock = threading.Lock()
+        self.hosts: dict[str, threading.Semaphore] = defaultdict(
+            lambda: threading.Semaphore(self.per_host)
+        )
+
+    def get_semaphore(self, uri: str) -> threading.Semaphore:
+        with self.lock:
+            return self.hosts[urlparse(uri).netloc]
+
+    def fetch(self, source: Source) -> Source:
+        with self.get_semaphore(source.uri):
+            # warm the head cache for the resolver (cache key, mimetype)
+            head = source.head()
+            # stream the body into the archive, re-use it while the remote
+            # validators (`ETag`, `Last-Modified`) don't change
+            key = fetch.download_file(source.uri, cache=bool(head.ckey))
+        source.archive_uri = fetch.get_archive_uri(key)
+        return source
+
+    def submit(self, source: Source) -> Future:
+        return self.executor.submit(self.fetch, source)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self) -> "Prefetcher":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.shutdown()
+
+
+def should_prefetch(ctx: Context) -> bool:
+    return bool(ctx.config.extract.fetch and ctx.source.is_http)
+
+
+def prefetch(
+    contexts: Iterable[Context],
+    workers: int | None = SETTINGS.prefetch,
+    per_host: int | None = SETTINGS.prefetch_per_host,
+) -> Generator[Context, None, None]:
+    """
+    Yield the given contexts in order while downloading up to `workers`
+    upcoming remote sources in the background
+    """
+    if not workers:
+        yield from contexts
+        return
+
+    queue: deque[tuple[Context, Future | None]] = deque()
+
+    def _next() -> Context:
+        ctx, future = queue.popleft()
+        if future is not None:
+            try:
+                future.result()
+            except Exception as e:
+                # the resolver will try again on its own
+                log.warning(f"Prefetch failed for `{ctx.source.uri}`: {e}")
+        return ctx
+
+    with Prefetcher(workers, per_host or workers) as prefetcher:
+        for ctx in contexts:
+            future = prefetcher.submit(ctx.source) if should_prefetch(ctx) else None
+            queue.append((ctx, future))
+            while len(queue) > workers:
+                yield _next()
+        while queue:
+            yield _next()
@@ -2,7 +2,7 @@
 Transform stage: map data records to ftm proxies
 """
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Callable, Generator
 
 from investigraph.model.mapping import QueryMapping
 
@@ -27,3 +27,29 @@ def map_record(
 def map_ftm(ctx: "Context", data: SDict, ix: int) -> CEGenerator:
     for mapping in ctx.config.transform.queries:
         yield from map_record(data, mapping, ctx.config.dataset.name)
+
+
+def yield_transformed(
+    ctx: "Context",
+    records: list[tuple[SDict, int]],
+    handler: Callable | None = None,
+) -> Generator[dict[str, Any], None, None]:
+    """
+    Map a batch of `(record, ix)` tuples with the configured transform handler,
+    errors of single records are logged and don't fail the batch
+    """
+    handler = handler or ctx.config.transform.get_handler()
+    for rec, ix in records:
+        try:
+            for proxy in handler(ctx, rec, ix):
+                yield proxy.to_dict()
+        except Exception as e:
+            ctx.log.error(f"{e.__class__.__name__}: {e}")
+
+
+def transform_batch(
+    ctx: "Context",
+    records: list[tuple[SDict, int]],
+    handler: Callable | None = None,
+) -> list[dict[str, Any]]:
+    return list(yield_transformed(ctx, records, handler))
@@ -0,0 +1,205 @@
+"""
+Per-stage throughput and latency metrics of a run, collected in this process
+(task runners that execute tasks in other processes only report what the flow
+process itself did)
+"""
+
+import os
+import resource
+import sys
+import tempfile
+import threading
+from bisect import bisect_left
+from functools import cache
+
+from anystore.io import smart_write
+from fsspec.core import url_to_fs
+from fsspec.implementations.local import LocalFileSystem
+from pydantic import BaseModel
+
+_lock = threading.Lock()
+
+# batch latency buckets in seconds
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class Histogram(BaseModel):
+    buckets: tuple[float, ...] = BUCKETS
+    counts: list[int] = [0] * (len(BUCKETS) + 1)  # last one is +Inf
+    sum: float = 0
+    count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class StageMetrics(BaseModel):
+    batches: int = 0
+    records_in: int = 0
+    records_out: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    seconds: float = 0
+    latency: Histogram = Histogram()
+
+    @property
+    def records_per_second(self) -> float:
+        if not self.seconds:
+            return 0
+        return self.records_in / self.seconds
+
+
+class CacheMetrics(BaseModel):
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        if not total:
+            return 0
+        return self.hits / total
+
+
+class HttpMetrics(BaseModel):
+    requests: int = 0
+    cached: int = 0  # served from cache (incl. revalidated)
+    bytes: int = 0
+
+
+class Metrics(BaseModel):
+    stages: dict[str, StageMetrics] = {}
+    cache: CacheMetrics = CacheMetrics()
+    http: HttpMetrics = HttpMetrics()
+    process_peak_rss: int = 0  # bytes, since the process started (not per run)
+
+    def observe(
+        self,
+        stage: str,
+        seconds: float,
+        records_in: int = 0,
+        records_out: int = 0,
+        bytes_in: int = 0,
+        bytes_out: int = 0,
+    ) -> None:
+        """
+        Record one processed batch of a stage
+        """
+        with _lock:
+            if stage not in self.stages:
+                self.stages[stage] = StageMetrics()
+            metrics = self.stages[stage]
+            metrics.batches += 1
+            metrics.records_in += records_in
+            metrics.records_out += records_out
+            metrics.bytes_in += bytes_in
+            metrics.bytes_out += bytes_out
+            metrics.seconds += seconds
+            metrics.latency.observe(seconds)
+
+    def cache_hit(self, hit: bool) -> None:
+        with _lock:
+            if hit:
+                self.cache.hits += 1
+            else:
+                self.cache.misses += 1
+
+    def update_rss(self) -> None:
+        # the os only tracks the peak over the lifetime of the process, for
+        # long-lived processes (e.g. a prefect worker) it may stem from an
+        # earlier run
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != "darwin":  # kilobytes on linux
+            rss *= 1024
+        self.process_peak_rss = max(self.process_peak_rss, rss)
+
+    def clear(self) -> None:
+        with _lock:
+            self.stages = {}
+            self.cache = CacheMetrics()
+            self.http = HttpMetrics()
+            self.process_peak_rss = 0
+
+    def to_prometheus(self, dataset: str) -> str:
+        """
+        Export in the prometheus text format (e.g. for the node exporter
+        textfile collector)
+        """
+        lines = []
+
+        def add(name: str, kind: str, help: str) -> None:
+            lines.append(f"# HELP investigraph_{name} {help}")
+            lines.append(f"# TYPE investigraph_{name} {kind}")
+
+        def sample(name: str, value: float, **labels: str) -> None:
+            labels = {"dataset": dataset, **labels}
+            label = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            lines.append(f"investigraph_{name}{{{label}}} {value}")
+
+        for name, help in (
+            ("batches", "Processed batches"),
+            ("records_in", "Records (or proxies) a stage consumed"),
+            ("records_out", "Records (or proxies) a stage produced"),
+            ("bytes_in", "Bytes a stage consumed"),
+            ("bytes_out", "Bytes a stage produced"),
+        ):
+            add(f"stage_{name}_total", "counter", help)
+            for stage, metrics in self.stages.items():
+                sample(f"stage_{name}_total", getattr(metrics, name), stage=stage)
+
+        add("stage_batch_seconds", "histogram", "Batch processing latency")
+        for stage, metrics in self.stages.items():
+            histogram = metrics.latency
+            total = 0
+            for bucket, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+                total += count
+                sample("stage_batch_seconds_bucket", total, stage=stage, le=str(bucket))
+            sample("stage_batch_seconds_sum", histogram.sum, stage=stage)
+            sample("stage_batch_seconds_count", histogram.count, stage=stage)
+
+        add("cache_hits_total", "counter", "Batch cache hits")
+        sample("cache_hits_total", self.cache.hits)
+        add("cache_misses_total", "counter", "Batch cache misses")
+        sample("cache_misses_total", self.cache.misses)
+        add("http_requests_total", "counter", "Http requests sent")
+        sample("http_requests_total", self.http.requests)
+        add("http_cached_total", "counter", "Http responses served from cache")
+        sample("http_cached_total", self.http.cached)
+        add("http_bytes_total", "counter", "Http bytes fetched")
+        sample("http_bytes_total", self.http.bytes)
+        add(
+            "process_peak_rss_bytes",
+            "gauge",
+            "Peak resident memory of the flow process since it started",
+        )
+        sample("process_peak_rss_bytes", self.process_peak_rss)
+        return "\n".join(lines) + "\n"
+
+
+@cache
+def get_metrics() -> Metrics:
+    return Metrics()
+
+
+def write_prometheus(uri: str, text: str) -> None:
+    """
+    Write a prometheus textfile, local files are replaced atomically so that
+    a collector never reads a partially written file
+    """
+    fs, path = url_to_fs(uri)
+    if not isinstance(fs, LocalFileSystem):
+        smart_write(uri, text.encode())
+        return
+    dirname = os.path.dirname(path)
+    fs.makedirs(dirname, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dirname, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(text.encode())
+        os.chmod(tmp, 0o644)  # readable by the exporter (mkstemp uses 0600)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
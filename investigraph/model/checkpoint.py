@@ -0,0 +1,149 @@
+"""
+A per-run checkpoint of extracted and loaded batches (appended as json lines),
+used to resume a failed run without processing its loaded batches again
+"""
+
+import threading
+from bisect import bisect_right
+from typing import Any, Callable, Generator, Iterable, Self
+
+import orjson
+from anystore.io import smart_open
+from fsspec.core import url_to_fs
+from pydantic import BaseModel
+
+from investigraph.model.context import Context
+
+_lock = threading.Lock()
+
+
+def write_checkpoint(uri: str, **data: Any) -> None:
+    with _lock, smart_open(uri, "ab") as fh:
+        fh.write(orjson.dumps(data, option=orjson.OPT_APPEND_NEWLINE))
+
+
+def checkpoint_batch(ctx: Context, key: str, start: int, end: int) -> None:
+    if ctx.checkpoint_uri is not None:
+        write_checkpoint(
+            ctx.checkpoint_uri, source=ctx.source.uri, batch=key, start=start, end=end
+        )
+
+
+def checkpoint_source(ctx: Context) -> None:
+    if ctx.checkpoint_uri is not None:
+        write_checkpoint(ctx.checkpoint_uri, source=ctx.source.uri, complete=True)
+
+
+def checkpoint_load(ctx: Context, key: str, fragment_uri: str | None) -> None:
+    if ctx.checkpoint_uri is not None:
+        write_checkpoint(ctx.checkpoint_uri, loaded=key, fragment=fragment_uri)
+
+
+def make_skip(ranges: list[tuple[int, int]]) -> Callable[[int], bool]:
+    """
+    Get a function that tells if a record index is in one of the (sorted) ranges
+    """
+    starts = [start for start, _ in ranges]
+
+    def skip(ix: int) -> bool:
+        i = bisect_right(starts, ix) - 1
+        return i > -1 and ix <= ranges[i][1]
+
+    return skip
+
+
+class Batch(BaseModel):
+    source: str
+    start: int
+    end: int
+
+
+class Checkpoint(BaseModel):
+    uri: str
+    batches: dict[str, Batch] = {}  # records key -> batch
+    loaded: dict[str, str | None] = {}  # records key -> fragment part
+    complete: set[str] = set()  # fully extracted source uris
+
+    def get_done(self, source_uri: str) -> list[tuple[int, int]]:
+        """
+        Sorted, non-overlapping record ranges of the loaded batches of a source
+        (batches of a resumed run span the records they skipped)
+        """
+        ranges = sorted(
+            (b.start, b.end)
+            for k, b in self.batches.items()
+            if b.source == source_uri and k in self.loaded
+        )
+        merged: list[tuple[int, int]] = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def is_complete(self, source_uri: str) -> bool:
+        if source_uri not in self.complete:
+            return False
+        return all(
+            k in self.loaded for k, b in self.batches.items() if b.source == source_uri
+        )
+
+    def filter(self, contexts: Iterable[Context]) -> Generator[Context, None, None]:
+        """
+        Yield only sources that were not completely loaded
+        """
+        for ctx in contexts:
+            if self.is_complete(ctx.source.uri):
+                ctx.log.info("CHECKPOINT complete: `%s`" % ctx.source.uri)
+                continue
+            yield ctx
+
+    def get_fragment_uris(self, source_uri: str | None = None) -> list[str]:
+        """
+        Fragment parts of the loaded batches (of a source)
+        """
+        uris = set()
+        for key, uri in self.loaded.items():
+            if uri is None:
+                continue
+            if source_uri is not None:
+                batch = self.batches.get(key)
+                if batch is None or batch.source != source_uri:
+                    continue
+            uris.add(uri)
+        return sorted(uris)
+
+    def exists(self) -> bool:
+        fs, path = url_to_fs(self.uri)
+        return fs.exists(path)
+
+    def delete(self) -> None:
+        fs, path = url_to_fs(self.uri)
+        if fs.exists(path):
+            fs.rm(path)
+
+    @classmethod
+    def load(cls, uri: str) -> Self:
+        checkpoint = cls(uri=uri)
+        if not checkpoint.exists():
+            return checkpoint
+        line = b"\n"
+        with smart_open(uri, "rb") as fh:
+            for line in fh:
+                try:
+                    data = orjson.loads(line)
+                except orjson.JSONDecodeError:  # incomplete last line of a crash
+                    continue
+                if "batch" in data:
+                    checkpoint.batches[data["batch"]] = Batch(**data)
+                elif "loaded" in data:
+                    checkpoint.loaded[data["loaded"]] = data.get("fragment")
+                elif data.get("complete"):
+                    checkpoint.complete.add(data["source"])
+        if not line.endswith(b"\n"):
+            # terminate the torn last line of a crash, so that the records the
+            # resumed run appends start on a new line
+            with _lock, smart_open(uri, "ab") as fh:
+                fh.write(b"\n")
+        return checkpoint
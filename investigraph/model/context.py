@@ -10,7 +10,7 @@ from prefect import get_run_logger
 from prefect.exceptions import MissingContextError
 from pydantic import BaseModel, ConfigDict
 
-from investigraph.cache import Cache, get_cache
+from investigraph.cache import Cache, get_cache, get_run_cache
 from investigraph.exceptions import DataError
 from investigraph.logic.aggregate import AggregatorResult, merge
 from investigraph.model.config import Config
@@ -23,6 +23,8 @@ class BaseContext(BaseModel):
     dataset: str
     prefix: str
     config: Config
+    run_id: str | None = None
+    checkpoint_uri: str | None = None
 
     def __hash__(self) -> int:
         return hash(repr(self.model_dump()))
@@ -32,6 +34,8 @@ class BaseContext(BaseModel):
 
     @property
     def cache(self) -> Cache:
+        if self.run_id is not None:
+            return get_run_cache(self.run_id)
         return get_cache()
 
     @property
@@ -96,6 +100,8 @@ class BaseContext(BaseModel):
             prefix=self.config.dataset.prefix,
             config=self.config,
             source=source,
+            run_id=self.run_id,
+            checkpoint_uri=self.checkpoint_uri,
         )
 
     def from_sources(self) -> Generator["Context", None, None]:
@@ -105,11 +111,18 @@ class BaseContext(BaseModel):
             yield self.from_source(source)
 
     @classmethod
-    def from_config(cls, config: Config) -> "BaseContext":
+    def from_config(
+        cls,
+        config: Config,
+        run_id: str | None = None,
+        checkpoint_uri: str | None = None,
+    ) -> "BaseContext":
         return cls(
             dataset=config.dataset.name,
             prefix=config.dataset.prefix,
             config=config,
+            run_id=run_id,
+            checkpoint_uri=checkpoint_uri,
         )
 
 
@@ -3,27 +3,59 @@ from typing import Any, Self
 
 from anystore.types import Uri
 from prefect.runtime import flow_run
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 
+from investigraph.exceptions import ImproperlyConfigured
+from investigraph.metrics import Metrics
 from investigraph.model.config import Config, get_config
 from investigraph.settings import SETTINGS
 from investigraph.util import ensure_path
 
+Shard = tuple[int, int]
+
+
+def parse_shard(value: str | Shard | None) -> Shard | None:
+    """
+    Parse a shard definition `i/n` (1-based) into `(i, n)`
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            index, total = (int(v) for v in value.split("/"))
+        except ValueError:
+            raise ImproperlyConfigured(f"Invalid shard: `{value}` (use `i/n`)")
+    else:
+        index, total = value
+    if not 0 < index <= total:
+        raise ImproperlyConfigured(f"Invalid shard: `{index}/{total}`")
+    return index, total
+
 
 class FlowOptions(BaseModel):
     config: Uri
     aggregate: bool | None = None
     chunk_size: int | None = SETTINGS.chunk_size
     extract_only: bool | None = False
+    incremental: bool | None = False
+    shard: Shard | None = None
+    resume: str | None = None  # run id
 
     index_uri: str | None = None
     records_uri: str | None = None
     fragments_uri: str | None = None
     entities_uri: str | None = None
 
+    @field_validator("shard", mode="before")
+    @classmethod
+    def validate_shard(cls, value: Any) -> Shard | None:
+        return parse_shard(value)
+
     @property
     def flow_name(self) -> str:
         config = get_config(self.config)
+        if self.shard:
+            return "%s-%d-of-%d" % (config.dataset.name, *self.shard)
         return config.dataset.name
 
 
@@ -34,7 +66,13 @@ class Flow(BaseModel):
     end: datetime | None = None
     fragment_uris: set[str] | None = set()
     entities_uri: str | None = None
+    manifest_uri: str | None = None
+    checkpoint_uri: str | None = None
     extract_only: bool | None = False
+    incremental: bool | None = False
+    shard: Shard | None = None
+    resume: str | None = None
+    metrics: Metrics | None = None
 
     def __init__(self, **data):
         data["start"] = data.get("start", datetime.utcnow())
@@ -44,6 +82,9 @@ class Flow(BaseModel):
         options: FlowOptions | None = data.pop("options", None)
         if options:
             data["extract_only"] = data.pop("extract_only", options.extract_only)
+            data["incremental"] = data.pop("incremental", options.incremental)
+            data["shard"] = data.pop("shard", options.shard)
+            data["resume"] = data.pop("resume", options.resume)
             config = get_config(options.config)
 
             self.assign(config.extract, "chunk_size", options.chunk_size)
@@ -70,6 +111,31 @@ class Flow(BaseModel):
         if self.config.load.entities_uri is None:
             self.config.load.entities_uri = (path / "entities.ftm.json").as_uri()
         self.entities_uri = self.config.load.entities_uri
+        if self.manifest_uri is None:
+            if self.shard:
+                name = "manifest.%d-of-%d.json" % self.shard
+            else:
+                name = "manifest.json"
+            self.manifest_uri = (path / name).as_uri()
+        checkpoint_id = self.resume or self.run_id
+        if self.checkpoint_uri is None and checkpoint_id is not None:
+            path = ensure_path(path / "checkpoints")
+            self.checkpoint_uri = (path / f"{checkpoint_id}.jsonl").as_uri()
+
+    def get_shard_uri(self, shard: Shard) -> str:
+        """
+        The uri of the list of fragment parts a shard produced, stored next to
+        the index file so that all shards share it
+        """
+        base = self.config.load.index_uri.rsplit("/", 1)[0]
+        return "%s/shard.%d-of-%d.json" % (base, *shard)
+
+    @property
+    def metrics_uri(self) -> str:
+        base = self.config.load.index_uri.rsplit("/", 1)[0]
+        if self.shard:
+            return "%s/metrics.%d-of-%d.json" % (base, *self.shard)
+        return "%s/metrics.json" % base
 
     @classmethod
     def from_options(cls, options: FlowOptions) -> Self:
@@ -0,0 +1,131 @@
+"""
+A persisted per-dataset manifest of processed sources and the fragment parts
+they produced, used to skip unchanged sources on subsequent runs
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Any, Generator, Iterable, Self
+from urllib.parse import urlparse
+
+from anystore.io import smart_open, smart_read, smart_write
+from fsspec.core import url_to_fs
+from pydantic import BaseModel, PrivateAttr
+
+from investigraph.model.context import Context
+from investigraph.model.source import Source
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+class SourceState(BaseModel):
+    uri: str
+    size: int | None = None
+    modified: str | None = None  # mtime, etag or last-modified
+    checksum: str | None = None
+    fragment_uris: list[str] = []
+    updated_at: datetime | None = None
+
+    def is_same_file(self, other: "SourceState") -> bool:
+        if self.modified is None:
+            return False
+        return self.size == other.size and self.modified == other.modified
+
+
+def get_checksum(uri: str, **storage_options: Any) -> str:
+    digest = hashlib.sha1()
+    with smart_open(uri, "rb", **storage_options) as fh:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_source_state(source: Source, **storage_options: Any) -> SourceState:
+    if source.is_http:
+        head = source.head()
+        return SourceState(uri=source.uri, size=head.content_length, modified=head.ckey)
+    fs, path = url_to_fs(source.uri, **storage_options)
+    info = fs.info(path)
+    modified = None
+    for key in ("ETag", "etag", "mtime", "LastModified", "last_modified", "updated"):
+        if info.get(key) is not None:
+            modified = str(info[key])
+            break
+    return SourceState(uri=source.uri, size=info.get("size"), modified=modified)
+
+
+def fragments_exist(uris: Iterable[str]) -> bool:
+    for uri in uris:
+        if "sql" in urlparse(uri).scheme:  # persisted in the store
+            continue
+        fs, path = url_to_fs(uri)
+        if not fs.exists(path):
+            return False
+    return True
+
+
+class Manifest(BaseModel):
+    uri: str
+    sources: dict[str, SourceState] = {}
+
+    _pending: dict[str, SourceState] = PrivateAttr(default_factory=dict)
+    _reused: list[str] = PrivateAttr(default_factory=list)
+
+    def check(self, ctx: Context) -> tuple[bool, SourceState]:
+        """
+        Get the current state of a source and whether it is unchanged since the
+        last run (and its previous fragments still exist)
+        """
+        storage_options = ctx.config.seed.storage_options or {}
+        state = get_source_state(ctx.source, **storage_options)
+        previous = self.sources.get(ctx.source.uri)
+        if previous is not None and not fragments_exist(previous.fragment_uris):
+            previous = None
+        if previous is not None and state.is_same_file(previous):
+            state.checksum = previous.checksum
+            return True, state
+        if not ctx.source.is_http:
+            # modification time changed, but maybe the content didn't
+            state.checksum = get_checksum(ctx.source.uri, **storage_options)
+            if previous is not None and state.checksum == previous.checksum:
+                return True, state
+        return False, state
+
+    def filter(self, contexts: Iterable[Context]) -> Generator[Context, None, None]:
+        """
+        Yield only new or changed sources, unchanged sources keep their
+        previous fragments (see `reused`)
+        """
+        for ctx in contexts:
+            unchanged, state = self.check(ctx)
+            if unchanged:
+                state.fragment_uris = self.sources[ctx.source.uri].fragment_uris
+                self._reused.extend(state.fragment_uris)
+                self.update(state)
+                ctx.log.info("UNCHANGED: `%s`" % ctx.source.uri)
+                continue
+            self._pending[ctx.source.uri] = state
+            yield ctx
+
+    @property
+    def reused(self) -> list[str]:
+        return self._reused
+
+    def done(self, uri: str, fragment_uris: Iterable[str | None]) -> None:
+        state = self._pending.pop(uri)
+        state.fragment_uris = sorted({u for u in fragment_uris if u is not None})
+        self.update(state)
+
+    def update(self, state: SourceState) -> None:
+        state.updated_at = datetime.utcnow()
+        self.sources[state.uri] = state
+
+    def save(self) -> None:
+        smart_write(self.uri, self.model_dump_json().encode())
+
+    @classmethod
+    def load(cls, uri: str) -> Self:
+        fs, path = url_to_fs(uri)
+        if fs.exists(path):
+            return cls.model_validate_json(smart_read(uri))
+        return cls(uri=uri)
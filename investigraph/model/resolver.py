@@ -53,7 +53,7 @@ class Resolver(BaseModel):
             self.head = self.source.head()
 
     def _resolve_http(self) -> None:
-        if self.response is None:
+        if self.response is None and self.source.is_remote:
             self._resolve_head()
             if self.source.stream is None:
                 if self.mimetype == types.CSV:
@@ -66,24 +66,29 @@ class Resolver(BaseModel):
         if self.content is None:
             if self.stream:
                 raise ImproperlyConfigured("%s is a stream" % self.source.uri)
-            if self.source.is_http:
+            if self.source.is_remote:
                 self._resolve_http()
                 self.content = self.response.content
             else:
-                with open(self.source.uri, "rb") as fh:
+                with open(self.get_local_uri(), "rb") as fh:
                     self.content = fh.read()
             self.checksum = make_checksum(BytesIO(self.content))
 
     def iter(self, chunk_size: int | None = 10_000) -> BytesGenerator:
         if self.source.stream:
-            chunk = b""
+            # write lines into a growable buffer (amortized linear) and hand out
+            # the buffer itself instead of copying concatenated bytes around
+            chunk = BytesIO()
             for ix, line in enumerate(self.iter_lines(), 1):
-                chunk += line + b"\r"
+                chunk.write(line)
+                chunk.write(b"\r")
                 if ix % chunk_size == 0:
-                    yield BytesIO(chunk)
-                    chunk = b""
-            if chunk:
-                yield BytesIO(chunk)
+                    chunk.seek(0)
+                    yield chunk
+                    chunk = BytesIO()
+            if chunk.tell():
+                chunk.seek(0)
+                yield chunk
         else:
             yield BytesIO(self.get_content())
 
@@ -91,13 +96,16 @@ class Resolver(BaseModel):
         if not self.source.stream:
             raise ImproperlyConfigured("%s is not a stream" % self.source.uri)
 
-        if self.source.is_http:
+        if self.source.is_remote:
             self._resolve_http()
             yield from self.response.iter_lines()
         else:
-            with open(self.source.uri, "rb") as fh:
+            with open(self.get_local_uri(), "rb") as fh:
                 yield from fh
 
+    def get_local_uri(self) -> str:
+        return self.source.archive_uri or self.source.uri
+
     def get_content(self) -> bytes:
         self._resolve_content()
         return self.content
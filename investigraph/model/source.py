@@ -2,7 +2,6 @@ import mimetypes
 from datetime import datetime
 from urllib.parse import urlparse
 
-import requests
 from dateparser import parse as parse_date
 from normality import slugify
 from pantomime import normalize_mimetype, types
@@ -10,6 +9,7 @@ from pydantic import BaseModel
 from runpandarun import Playbook
 from runpandarun.util import PathLike, absolute_path
 
+from investigraph.session import head
 from investigraph.util import slugified_dict
 
 
@@ -48,6 +48,7 @@ class Source(BaseModel):
     pandas: Playbook | None = Playbook()
     stream: bool | None = None
     data: dict | None = {}
+    archive_uri: str | None = None  # local copy of a prefetched remote source
 
     def __init__(self, **data):
         data["uri"] = str(data["uri"])
@@ -70,8 +71,12 @@ class Source(BaseModel):
     def is_http(self) -> bool:
         return self.scheme.startswith("http")
 
+    @property
+    def is_remote(self) -> bool:
+        # prefetched http sources are read from their archived copy
+        return self.is_http and self.archive_uri is None
+
     def head(self) -> SourceHead:
         if self.is_http:
-            res = requests.head(self.uri)
-            return SourceHead(**slugified_dict(res.headers))
+            return SourceHead(**slugified_dict(head(self.uri)))
         raise NotImplementedError("Cannot fetch head for scheme %s" % self.scheme)
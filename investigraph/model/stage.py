@@ -5,6 +5,7 @@ from pydantic import BaseModel
 from runpandarun import Playbook
 
 from investigraph.model.mapping import QueryMapping
+from investigraph.profile import get_profiler
 from investigraph.settings import SETTINGS
 from investigraph.types import TaskResult
 from investigraph.util import get_func, pydantic_merge
@@ -25,8 +26,16 @@ class Stage(BaseModel):
         data["handler"] = data.pop("handler", self.default_handler)
         super().__init__(**data)
 
+    @property
+    def stage(self) -> str:
+        return self.__class__.__name__.removesuffix("Stage").lower()
+
     def get_handler(self) -> Callable:
-        return get_func(self.handler)
+        handler = get_func(self.handler)
+        profiler = get_profiler()
+        if profiler is not None:
+            return profiler.wrap(self.stage, handler)
+        return handler
 
     def handle(self, ctx: "Context", *args, **kwargs) -> TaskResult:
         handler = self.get_handler()
@@ -79,6 +88,13 @@ class AggregateStage(Stage):
     db_uri: str | None = SETTINGS.ftm_store_uri
 
     def __init__(self, **data):
-        if data.pop("handler", None) == "db":
+        handler = data.pop("handler", None)
+        if handler == "db":
             data["handler"] = "investigraph.logic.aggregate:in_db"
+        elif handler == "streaming":
+            data["handler"] = "investigraph.logic.aggregate:streaming"
         super().__init__(**data)
+
+    @property
+    def is_streaming(self) -> bool:
+        return self.handler == "investigraph.logic.aggregate:streaming"
@@ -2,13 +2,19 @@
 The main entrypoint for the prefect flow
 """
 
-from collections.abc import Generator
+import time
+from collections import deque
+from collections.abc import Generator, Iterable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from functools import cache
+from queue import Full, Queue
+from threading import Event
 from typing import Any, Type
+from uuid import uuid4
 
 import orjson
-from anystore.io import smart_open
+from anystore.io import smart_open, smart_read, smart_write
 from anystore.util import make_data_checksum
 from ftmq.model.coverage import DatasetStats
 from prefect import flow, task
@@ -17,10 +23,29 @@ from prefect_dask import DaskTaskRunner
 from prefect_ray import RayTaskRunner
 
 from investigraph import __version__
+from investigraph.cache import DELETE
+from investigraph.chunk import MIN_SIZE, clear_sizers, get_sizer
+from investigraph.exceptions import ImproperlyConfigured
+from investigraph.executor import Executor, LocalExecutor, PrefectExecutor, TaskFuture
+from investigraph.logic.aggregate import buffering, get_buffer
+from investigraph.logic.prefetch import prefetch
+from investigraph.logic.transform import transform_batch, yield_transformed
+from investigraph.metrics import Metrics, get_metrics, write_prometheus
+from investigraph.model.checkpoint import (
+    Checkpoint,
+    checkpoint_batch,
+    checkpoint_load,
+    checkpoint_source,
+    make_skip,
+)
 from investigraph.model.context import BaseContext, Context
 from investigraph.model.flow import Flow, FlowOptions
+from investigraph.model.manifest import Manifest
 from investigraph.model.resolver import Resolver
+from investigraph.pool import get_pool, transform_pools
+from investigraph.session import get_stats
 from investigraph.settings import SETTINGS
+from investigraph.util import get_shard
 
 
 @cache
@@ -38,6 +63,12 @@ def get_task_cache_key(_, params) -> str:
     return params["ckey"]
 
 
+def get_transform_load_cache_key(_, params) -> str:
+    # prefect cache keys are global: don't return a proxies key of `transform`
+    # as a fragments uri (or the reverse) when `fuse_transform_load` is toggled
+    return f"transform_load#{params['ckey']}"
+
+
 @task(
     retries=SETTINGS.task_retries,
     retry_delay_seconds=SETTINGS.task_retry_delay,
@@ -47,12 +78,37 @@ def get_task_cache_key(_, params) -> str:
     cache_result_in_memory=False,
 )
 def aggregate(ctx: Context, results: list[str], ckey: str) -> DatasetStats:
+    start = time.perf_counter()
     fragments, stats = ctx.aggregate(ctx, results)
+    get_metrics().observe(
+        "aggregate",
+        time.perf_counter() - start,
+        records_in=fragments,
+        records_out=stats.entity_count,
+    )
     ctx.log.info("AGGREGATED %d fragments to %d proxies", fragments, stats.entity_count)
     ctx.log.info("OUTPUT: %s", ctx.config.load.entities_uri)
     return stats
 
 
+def load_batch(ctx: Context, proxies: Iterable[dict[str, Any]], ckey: str) -> str:
+    buffer = get_buffer(ctx)
+    if buffer is None:
+        return ctx.load_fragments(proxies, ckey=ckey)
+    # streaming aggregation: keep the proxies while they are written and merge
+    # them once the fragment part is complete
+    loaded = []
+
+    def collect() -> Generator[dict[str, Any], None, None]:
+        for proxy in proxies:
+            loaded.append(proxy)
+            yield proxy
+
+    out = ctx.load_fragments(collect(), ckey=ckey)
+    buffer.add_part(out, loaded)
+    return out
+
+
 @task(
     retries=SETTINGS.task_retries,
     retry_delay_seconds=SETTINGS.task_retry_delay,
@@ -61,12 +117,23 @@ def aggregate(ctx: Context, results: list[str], ckey: str) -> DatasetStats:
     refresh_cache=not SETTINGS.task_cache or not SETTINGS.load_cache,
     cache_result_in_memory=False,
 )
-def load(ctx: Context, ckey: str) -> str | None:
+def load(ctx: Context, ckey: str, batch: str | None = None) -> str | None:
+    size = ctx.cache.sizes.get(ckey, 0)
     proxies = ctx.cache.get(ckey)
     if proxies is None:
         ctx.log.warning(f"No proxies found for cache key `{ckey}`")
         return
-    out = ctx.load_fragments(proxies, ckey=ckey)
+    start = time.perf_counter()
+    out = load_batch(ctx, proxies, ckey)
+    get_metrics().observe(
+        "load",
+        time.perf_counter() - start,
+        records_in=len(proxies),
+        records_out=len(proxies),
+        bytes_in=size,
+    )
+    if batch is not None:
+        checkpoint_load(ctx, batch, out)
     ctx.log.info("LOADED %d proxies", len(proxies))
     ctx.log.info("OUTPUT: %s", out)
     return out
@@ -81,62 +148,195 @@ def load(ctx: Context, ckey: str) -> str | None:
     cache_result_in_memory=False,
 )
 def transform(ctx: Context, ckey: str) -> str | None:
-    proxies: list[dict[str, Any]] = []
+    size = ctx.cache.sizes.get(ckey, 0)
+    if SETTINGS.transform_processes and ctx.cache.is_shared:
+        # the worker process fetches the records and stores the proxies
+        start = time.perf_counter()
+        key, records = get_pool(ctx).transform_key(ctx, ckey)
+        if key is None:
+            ctx.log.warning(f"No records found for cache key `{ckey}`")
+            return
+        seconds = time.perf_counter() - start
+        get_sizer(ctx).observe_seconds(records, seconds)
+        get_metrics().observe(
+            "transform",
+            seconds,
+            records_in=records,
+            bytes_in=size,
+            bytes_out=ctx.cache.sizes.get(key, 0),
+        )
+        ctx.log.info("TRANSFORMED %d records", records)
+        return key
     records = ctx.cache.get(ckey)
     if records is None:
         ctx.log.warning(f"No records found for cache key `{ckey}`")
         return
-    for rec, ix in records:
-        try:
-            for proxy in ctx.config.transform.handle(ctx, rec, ix):
-                proxies.append(proxy.to_dict())
-        except Exception as e:
-            ctx.log.error(f"{e.__class__.__name__}: {e}")
+    start = time.perf_counter()
+    if SETTINGS.transform_processes:
+        proxies = get_pool(ctx).transform_records(ctx, records)
+    else:
+        proxies = transform_batch(ctx, records)
+    seconds = time.perf_counter() - start
+    get_sizer(ctx).observe_seconds(len(records), seconds)
+    ctx.log.info("TRANSFORMED %d records", len(records))
+    key = ctx.cache.set(proxies)
+    get_metrics().observe(
+        "transform",
+        seconds,
+        records_in=len(records),
+        records_out=len(proxies),
+        bytes_in=size,
+        bytes_out=ctx.cache.sizes.get(key, 0),
+    )
+    return key
+
+
+@task(
+    retries=SETTINGS.task_retries,
+    retry_delay_seconds=SETTINGS.task_retry_delay,
+    cache_key_fn=get_transform_load_cache_key,
+    cache_expiration=SETTINGS.task_cache_expiration,
+    refresh_cache=not all(
+        (SETTINGS.task_cache, SETTINGS.transform_cache, SETTINGS.load_cache)
+    ),
+    cache_result_in_memory=False,
+)
+def transform_load(ctx: Context, ckey: str) -> str | None:
+    """
+    Transform a batch and stream the proxies directly into the loader, without
+    storing them in the cache in between
+    """
+    # keep the records until the batch is loaded, so that retries can use them
+    size = ctx.cache.sizes.get(ckey, 0)
+    records = ctx.cache.get(ckey, delete=False)
+    if records is None:
+        ctx.log.warning(f"No records found for cache key `{ckey}`")
+        return
+    start = time.perf_counter()
+    if SETTINGS.transform_processes:
+        proxies = get_pool(ctx).transform_records(ctx, records)
+    else:
+        proxies = yield_transformed(ctx, records)
+    # the records key (`<source>#<seq>#<fingerprint>`) would put `#` (the url
+    # fragment delimiter) into the fragment part uri
+    out = load_batch(ctx, proxies, make_data_checksum(ckey))
+    seconds = time.perf_counter() - start
+    get_sizer(ctx).observe_seconds(len(records), seconds)
+    get_metrics().observe(
+        "transform_load", seconds, records_in=len(records), bytes_in=size
+    )
+    checkpoint_load(ctx, ckey, out)
+    if DELETE:
+        ctx.cache.delete(ckey)
     ctx.log.info("TRANSFORMED %d records", len(records))
-    return ctx.cache.set(proxies)
+    ctx.log.info("OUTPUT: %s", out)
+    return out
+
+
+def get_batch_prefix(ctx: Context, batch_keys: list[str]) -> str:
+    # source and sequence number of the next batch
+    return ctx.make_cache_key(ctx.source.name, str(len(batch_keys)))
 
 
 def extract(
-    ctx: Context, ckey: str, res: Resolver | None = None
+    ctx: Context,
+    ckey: str,
+    res: Resolver | None = None,
+    checkpoint: Checkpoint | None = None,
 ) -> Generator[str, None, None]:
     ctx.log.info("Starting EXTRACT stage ...")
-    if SETTINGS.task_cache and SETTINGS.extract_cache:
+    # record ranges of batches a previous attempt of this run already loaded
+    done = []
+    if checkpoint is not None:
+        done = checkpoint.get_done(ctx.source.uri)
+    if done:
+        ctx.log.info("RESUME: skipping %d loaded batches" % len(done))
+    elif SETTINGS.task_cache and SETTINGS.extract_cache:
         cached_result = ctx.cache.get(ckey)
         if cached_result is not None:
-            ctx.log.info("EXTRACT complete (CACHED)")
-            yield from cached_result
-            return
+            # make sure all batches are still there (one round-trip)
+            if ctx.cache.exists(*cached_result) == len(cached_result):
+                ctx.log.info("EXTRACT complete (CACHED)")
+                yield from cached_result
+                return
+            ctx.log.warning("EXTRACT cache incomplete, extracting again ...")
     if res is not None:
         enumerator = enumerate(ctx.config.extract.handle(ctx, res), 1)
     else:
         enumerator = enumerate(ctx.config.extract.handle(ctx), 1)
+    skip = make_skip(done)
+    sizer = get_sizer(ctx)
     batch = []
     batch_keys = []
     ix = 0
+    metrics = get_metrics()
+    start = time.perf_counter()
+
+    def store(batch: list[tuple[Any, int]]) -> str:
+        nonlocal start
+        ctx.cache.throttle()
+        key = ctx.cache.set(batch, prefix=get_batch_prefix(ctx, batch_keys))
+        size = ctx.cache.sizes.get(key, 0)
+        checkpoint_batch(ctx, key, batch[0][1], batch[-1][1])
+        sizer.observe_bytes(len(batch), size)
+        sizer.add(len(batch))
+        batch_keys.append(key)
+        # the time it took to read the records of this batch
+        metrics.observe(
+            "extract",
+            time.perf_counter() - start,
+            records_in=len(batch),
+            records_out=len(batch),
+            bytes_out=size,
+        )
+        start = time.perf_counter()
+        return key
+
     for ix, rec in enumerator:
+        if done and skip(ix):
+            continue
         batch.append((rec, ix))
-        if ix % ctx.config.transform.chunk_size == 0:
+        if sizer.is_adaptive and not sizer.sizes and len(batch) == MIN_SIZE:
+            # estimate the record size before the first batch gets too big
+            sizer.observe_bytes(len(batch), len(ctx.cache.serializer.dumps(batch)))
+        if len(batch) >= sizer.size:
             ctx.log.info("extracting record %d ...", ix)
-            batch_key = ctx.cache.set(batch)
-            batch_keys.append(batch_key)
-            yield batch_key
+            yield store(batch)
             batch = []
     if batch:
-        batch_key = ctx.cache.set(batch)
-        batch_keys.append(batch_key)
-        yield batch_key
-    ctx.cache.set(batch_keys, ckey)
+        yield store(batch)
+    if not done:
+        ctx.cache.set(batch_keys, ckey)
+    checkpoint_source(ctx)
+    if sizer.is_adaptive:
+        ctx.log.info("CHUNK SIZE (adaptive): %s" % sizer.get_summary())
     ctx.log.info("EXTRACTED %d records", ix)
 
 
-@flow(
-    name="investigraph-extract",
-    version=__version__,
-    flow_run_name="{ctx.source.name}",
-    task_runner=get_runner_from_env(),
-    cache_result_in_memory=False,
-)
-def run_pipeline(ctx: Context, extract_only: bool | None = False) -> list[Any]:
+def wait_for_window(
+    inflight: deque[tuple[TaskFuture, int]], executor: Executor
+) -> None:
+    """
+    Block extraction until the batches in transform/load (and their bytes)
+    fit into the configured in-flight window
+    """
+
+    def is_full() -> bool:
+        if SETTINGS.inflight_batches and len(inflight) >= SETTINGS.inflight_batches:
+            return True
+        if SETTINGS.inflight_bytes:
+            return sum(size for _, size in inflight) >= SETTINGS.inflight_bytes
+        return False
+
+    while inflight and is_full():
+        future, _ = inflight.popleft()
+        executor.wait(future)
+
+
+def get_resolver(ctx: Context) -> tuple[Resolver | None, str]:
+    """
+    Get the resolver (if fetching) and the extract cache key for the source
+    """
     res = None
     if ctx.config.extract.fetch:
         res = Resolver(source=ctx.source)
@@ -145,20 +345,168 @@ def run_pipeline(ctx: Context, extract_only: bool | None = False) -> list[Any]:
         ckey = res.get_cache_key()
     else:
         ckey = ctx.source.uri
+    return res, f"extract-{ckey}"
 
+
+def submit_batch(ctx: Context, key: str, executor: Executor) -> TaskFuture:
+    if SETTINGS.fuse_transform_load:
+        return executor.submit(transform_load, ctx, key)
+    transformed = executor.submit(transform, ctx, key)
+    return executor.submit(load, ctx, transformed, key)
+
+
+def submit_batches(
+    ctx: Context,
+    keys: Iterable[str],
+    executor: Executor,
+    inflight: deque[tuple[TaskFuture, int]] | None = None,
+) -> list[TaskFuture]:
     results = []
-    for key in extract(ctx, f"extract-{ckey}", res):
-        if extract_only:
+    if inflight is None:
+        inflight = deque()
+    for key in keys:
+        size = ctx.cache.sizes.get(key, 0)
+        loaded = submit_batch(ctx, key, executor)
+        results.append(loaded)
+        inflight.append((loaded, size))
+        wait_for_window(inflight, executor)
+    return results
+
+
+def extract_to_queue(
+    ctx: Context,
+    ix: int,
+    queue: Queue,
+    stop: Event,
+    checkpoint: Checkpoint | None = None,
+) -> None:
+    """
+    Extract a source in a worker thread and put its batch keys into the queue,
+    followed by `None` when done (or the exception if it failed)
+    """
+
+    def put(item: tuple[int, str | Exception | None]) -> bool:
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=1)
+                return True
+            except Full:
+                continue
+        return False
+
+    try:
+        res, ckey = get_resolver(ctx)
+        for key in extract(ctx, ckey, res, checkpoint):
+            if not put((ix, key)):
+                return
+    except Exception as e:
+        put((ix, e))
+        return
+    put((ix, None))
+
+
+@flow(
+    name="investigraph-extract",
+    version=__version__,
+    flow_run_name="{ctx.source.name}",
+    task_runner=get_runner_from_env(),
+    cache_result_in_memory=False,
+)
+def run_pipeline(
+    ctx: Context,
+    extract_only: bool | None = False,
+    checkpoint: Checkpoint | None = None,
+) -> list[Any]:
+    return process_source(ctx, PrefectExecutor(), extract_only, checkpoint)
+
+
+def process_source(
+    ctx: Context,
+    executor: Executor,
+    extract_only: bool | None = False,
+    checkpoint: Checkpoint | None = None,
+) -> list[TaskFuture]:
+    res, ckey = get_resolver(ctx)
+    if extract_only:
+        for key in extract(ctx, ckey, res):
             with smart_open(ctx.config.extract.records_uri, mode="ba") as f:
                 for record, _ in ctx.cache.get(key):
                     f.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
-            return results
+            return []
+    return submit_batches(ctx, extract(ctx, ckey, res, checkpoint), executor)
 
-        transformed = transform.submit(ctx, key)
-        loaded = load.submit(ctx, transformed)
-        results.append(loaded)
 
-    return results
+def run_pipelines(
+    contexts: Iterable[Context],
+    executor: Executor,
+    extract_only: bool | None = False,
+    checkpoint: Checkpoint | None = None,
+) -> Generator[tuple[Context, list[TaskFuture]], None, None]:
+    """
+    Run the pipeline for each source and yield their load futures (skipping
+    the batches the `checkpoint` of the run has as loaded). With
+    `SETTINGS.source_concurrency` > 1, up to that many sources are extracted
+    concurrently in threads of the flow process, their batches are submitted
+    as soon as they are extracted (within the in-flight window). Sources are
+    always yielded in their order, so that the fragment parts (and the
+    aggregation cache key) are deterministic.
+    """
+    if SETTINGS.source_concurrency < 2 or extract_only:
+        for ctx in contexts:
+            if executor.subflows:
+                yield ctx, run_pipeline(ctx, extract_only, checkpoint)
+            else:
+                yield ctx, process_source(ctx, executor, extract_only, checkpoint)
+        return
+    # a bounded queue keeps the extract workers from running ahead of the
+    # transform/load submission (and the cache throttle)
+    queue: Queue[tuple[int, str | Exception | None]] = Queue(
+        SETTINGS.source_concurrency
+    )
+    stop = Event()
+    inflight: deque[tuple[TaskFuture, int]] = deque()
+    running: dict[int, tuple[Context, list[TaskFuture]]] = {}
+    finished: dict[int, tuple[Context, list[TaskFuture]]] = {}
+    next_ix = 0
+    sources = enumerate(contexts)
+    pool = ThreadPoolExecutor(
+        SETTINGS.source_concurrency, thread_name_prefix="investigraph-extract"
+    )
+
+    def start_next() -> None:
+        for ix, ctx in sources:
+            running[ix] = (ctx, [])
+            pool.submit(extract_to_queue, ctx, ix, queue, stop, checkpoint)
+            return
+
+    try:
+        for _ in range(SETTINGS.source_concurrency):
+            start_next()
+        while running:
+            ix, key = queue.get()
+            if isinstance(key, Exception):
+                raise key
+            ctx, results = running[ix]
+            if key is None:  # source done
+                finished[ix] = running.pop(ix)
+                start_next()
+                while next_ix in finished:
+                    yield finished.pop(next_ix)
+                    next_ix += 1
+            else:
+                results.extend(submit_batches(ctx, [key], executor, inflight))
+    finally:
+        stop.set()
+        pool.shutdown(wait=True)
+
+
+def aggregate_fragments(
+    ctx: BaseContext, fragments: list[str], executor: Executor
+) -> None:
+    res = executor.submit(aggregate, ctx, fragments, make_data_checksum(fragments))
+    ctx.config.dataset.apply_stats(res.result())
+    ctx.export_metadata()
+    ctx.log.info("INDEX (updated with coverage): %s" % ctx.config.load.index_uri)
 
 
 @flow(
@@ -169,24 +517,165 @@ def run_pipeline(ctx: Context, extract_only: bool | None = False) -> list[Any]:
     cache_result_in_memory=False,
 )
 def run(options: FlowOptions) -> Flow:
-    flow = Flow.from_options(options)
-    results = []
-    ctx = BaseContext.from_config(flow.config)
+    return execute(Flow.from_options(options), PrefectExecutor())
+
+
+def run_local(options: FlowOptions, workers: int | None = None) -> Flow:
+    """
+    Run the pipeline in a local thread pool without the prefect engine
+    """
+    flow = Flow(options=options, run_id=uuid4().hex)
+    executor = LocalExecutor(workers)
+    try:
+        return execute(flow, executor)
+    finally:
+        executor.shutdown()
+
+
+def execute(flow: Flow, executor: Executor) -> Flow:
+    """
+    The pipeline run, shared by the prefect flow and the local executor
+    """
+    get_stats().clear()  # http counters per run
+    get_metrics().clear()
+    clear_sizers()
+    checkpoint = None
+    if flow.checkpoint_uri is not None and not flow.extract_only:
+        checkpoint = Checkpoint.load(flow.checkpoint_uri)
+        if flow.resume and not checkpoint.exists():
+            raise ImproperlyConfigured(
+                f"No checkpoint for run `{flow.resume}`: `{flow.checkpoint_uri}`"
+            )
+    ctx = BaseContext.from_config(
+        flow.config,
+        run_id=flow.run_id,
+        checkpoint_uri=checkpoint.uri if checkpoint is not None else None,
+    )
+    if checkpoint is not None:
+        ctx.log.info(
+            "RUN `%s` (if it fails, resume it with `--resume %s`)"
+            % (flow.run_id, flow.resume or flow.run_id)
+        )
 
-    for ix, run_ctx in enumerate(ctx.from_sources()):
-        if ix == 0:  # only on first time
-            ctx.export_metadata()
-            ctx.log.info("INDEX: %s" % ctx.config.load.index_uri)
-        results.extend(run_pipeline(run_ctx, extract_only=flow.extract_only))
+    with ctx.cache.track_run(), transform_pools(), buffering(ctx):
+        results = []
+        sources = ctx.from_sources()
+        if flow.shard:
+            index, total = flow.shard
+            sources = (c for c in sources if get_shard(c.source.uri, total) == index)
+        manifest = None
+        pending = []
+        if flow.incremental and not flow.extract_only:
+            # only process new or changed sources
+            manifest = Manifest.load(flow.manifest_uri)
+            sources = manifest.filter(sources)
+        if flow.resume:
+            # skip sources the failed run completely loaded
+            ctx.log.info(
+                "RESUME run `%s`: %d batches already loaded"
+                % (flow.resume, len(checkpoint.loaded))
+            )
+            sources = checkpoint.filter(sources)
+
+        sources = run_pipelines(
+            prefetch(sources), executor, flow.extract_only, checkpoint
+        )
+        for ix, (run_ctx, source_results) in enumerate(sources):
+            if ix == 0:  # only on first time
+                ctx.export_metadata()
+                ctx.log.info("INDEX: %s" % ctx.config.load.index_uri)
+            results.extend(source_results)
+            if manifest is not None:
+                pending.append((run_ctx.source.uri, source_results))
 
-    if flow.config.aggregate:
         fragments = [r.result() for r in results]
-        res = aggregate.submit(ctx, fragments, make_data_checksum(fragments))
-        ctx.config.dataset.apply_stats(res.result())
-        ctx.export_metadata()
-        ctx.log.info("INDEX (updated with coverage): %s" % ctx.config.load.index_uri)
+        if flow.resume:
+            fragments.extend(checkpoint.get_fragment_uris())
+        if manifest is not None:
+            for uri, source_results in pending:
+                uris = [r.result() for r in source_results]
+                if flow.resume:
+                    uris.extend(checkpoint.get_fragment_uris(uri))
+                manifest.done(uri, uris)
+            manifest.save()
+            ctx.log.info(
+                "MANIFEST: %d sources processed, %d fragment parts re-used"
+                % (len(pending), len(manifest.reused))
+            )
+            fragments.extend(manifest.reused)
+
+        if flow.shard and not flow.extract_only:
+            # aggregation happens in a later `merge` of all shards
+            uri = flow.get_shard_uri(flow.shard)
+            smart_write(uri, orjson.dumps([f for f in fragments if f is not None]))
+            ctx.log.info("SHARD %d/%d: %s" % (*flow.shard, uri))
+        elif flow.config.aggregate:
+            aggregate_fragments(ctx, fragments, executor)
+
+    if checkpoint is not None:  # the run succeeded
+        checkpoint.delete()
+
+    http = get_stats()
+    ctx.log.info(
+        "HTTP HEAD: %d requests, %d served from cache",
+        http["head_miss"],
+        http["head_hit"],
+    )
+    ctx.log.info(
+        "HTTP GET: %d downloads, %d served from cache, %d revalidated (304)",
+        http["get_miss"],
+        http["get_hit"],
+        http["get_304"],
+    )
+
+    flow.end = datetime.utcnow()
+    flow.fragment_uris = filter(lambda x: x is not None, fragments)
+    flow.metrics = collect_metrics(flow)
+    ctx.log.info("METRICS: %s" % flow.metrics_uri)
+    return flow
+
+
+def collect_metrics(flow: Flow) -> Metrics:
+    """
+    Snapshot the metrics of the run and write them next to the index file (and
+    in the prometheus text format to `SETTINGS.metrics_prometheus_uri`)
+    """
+    metrics = get_metrics()
+    http = get_stats()
+    metrics.http.requests = http["head_miss"] + http["get_miss"]
+    metrics.http.cached = http["head_hit"] + http["get_hit"] + http["get_304"]
+    metrics.http.bytes = http["get_bytes"]
+    metrics.update_rss()
+    metrics = metrics.model_copy(deep=True)
+    smart_write(flow.metrics_uri, metrics.model_dump_json(indent=2).encode())
+    if SETTINGS.metrics_prometheus_uri:
+        data = metrics.to_prometheus(flow.config.dataset.name)
+        write_prometheus(SETTINGS.metrics_prometheus_uri, data)
+    return metrics
 
+
+@flow(
+    name="investigraph-merge",
+    version=__version__,
+    flow_run_name="{options.flow_name}-merge",
+    task_runner=get_runner_from_env(),
+    cache_result_in_memory=False,
+)
+def merge(options: FlowOptions, shards: int) -> Flow:
+    """
+    Aggregate the fragment parts of all shards of a sharded run
+    """
+    flow = Flow.from_options(options)
+    ctx = BaseContext.from_config(flow.config)
+    fragments = []
+    for index in range(1, shards + 1):
+        uri = flow.get_shard_uri((index, shards))
+        try:
+            fragments.extend(orjson.loads(smart_read(uri)))
+        except FileNotFoundError:
+            raise ImproperlyConfigured(f"Shard {index}/{shards} not found: `{uri}`")
+    ctx.log.info("MERGE %d shards with %d fragment parts" % (shards, len(fragments)))
+    aggregate_fragments(ctx, fragments, PrefectExecutor())
     flow.end = datetime.utcnow()
-    fragment_uris = [r.result() for r in results]
-    flow.fragment_uris = filter(lambda x: x is not None, fragment_uris)
+    flow.fragment_uris = fragments
     return flow
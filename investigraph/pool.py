@@ -0,0 +1,136 @@
+"""
+A process pool for the cpu bound transform stage that doesn't need dask or ray.
+
+Workers are started once per run, import the transform handler and build the
+query mappings on start-up and then map batches of records to proxies. If the
+batch cache is shared between processes (redis or the disk spool), batches are
+exchanged by their cache key, otherwise the records themselves are sent.
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Generator
+
+from investigraph.cache import DELETE
+from investigraph.logic.transform import transform_batch
+from investigraph.model.config import Config
+from investigraph.model.context import Context
+from investigraph.model.source import Source
+from investigraph.settings import SETTINGS
+from investigraph.types import SDict
+
+log = logging.getLogger(__name__)
+
+# state of a worker process
+_config: Config | None = None
+_handler: Callable | None = None
+
+
+def init_worker(config: Config) -> None:
+    global _config, _handler
+    _config = config
+    _handler = config.transform.get_handler()
+    for query in config.transform.queries or []:
+        query.get_mapping()
+
+
+def get_worker_context(source: Source, run_id: str | None) -> Context:
+    return Context(
+        dataset=_config.dataset.name,
+        prefix=_config.dataset.prefix,
+        config=_config,
+        source=source,
+        run_id=run_id,
+    )
+
+
+def transform_records(
+    source: Source, run_id: str | None, records: list[tuple[SDict, int]]
+) -> list[SDict]:
+    ctx = get_worker_context(source, run_id)
+    return transform_batch(ctx, records, _handler)
+
+
+def transform_key(
+    source: Source, run_id: str | None, ckey: str
+) -> tuple[str | None, int, int]:
+    ctx = get_worker_context(source, run_id)
+    records = ctx.cache.get(ckey)
+    if records is None:
+        return None, 0, 0
+    proxies = transform_batch(ctx, records, _handler)
+    key = ctx.cache.set(proxies)
+    return key, len(records), ctx.cache.sizes.pop(key, 0)
+
+
+class TransformPool:
+    def __init__(self, config: Config, processes: int) -> None:
+        self.processes = processes
+        self.executor = ProcessPoolExecutor(
+            processes,
+            # don't fork the threads of the (prefect) parent process
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(config,),
+        )
+
+    def transform_records(
+        self, ctx: Context, records: list[tuple[SDict, int]]
+    ) -> list[SDict]:
+        future = self.executor.submit(
+            transform_records, ctx.source, ctx.run_id, records
+        )
+        return future.result()
+
+    def transform_key(self, ctx: Context, ckey: str) -> tuple[str | None, int]:
+        """
+        Let the worker fetch the records and store the proxies itself, returns
+        the proxies key (`None` if the records weren't found) and the number
+        of records
+        """
+        future = self.executor.submit(transform_key, ctx.source, ctx.run_id, ckey)
+        key, records, size = future.result()
+        if key is not None:
+            # the worker consumed the records and wrote the proxies, keep the
+            # sizes of this process in sync for the memory budget and metrics
+            if DELETE:
+                ctx.cache.sizes.pop(ckey, None)
+            ctx.cache.sizes[key] = size
+        return key, records
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pools: dict[str, TransformPool] = {}
+_lock = threading.Lock()
+
+
+def get_pool(ctx: Context, processes: int | None = None) -> TransformPool:
+    processes = processes or SETTINGS.transform_processes
+    with _lock:
+        if ctx.dataset not in _pools:
+            log.info(f"Starting transform pool with {processes} processes ...")
+            _pools[ctx.dataset] = TransformPool(ctx.config, processes)
+        return _pools[ctx.dataset]
+
+
+def shutdown_pools() -> None:
+    with _lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+
+
+@contextmanager
+def transform_pools() -> Generator[None, None, None]:
+    """
+    Shut down the pools started within this block
+    """
+    try:
+        yield
+    finally:
+        shutdown_pools()
@@ -0,0 +1,228 @@
+"""
+Profile the stage handlers (seed, extract, transform, load, aggregate) of a
+run: a sampling profiler records the call stacks of all threads that are
+inside a handler, so that the results of the worker threads are merged per
+stage. Written as pstats (for `python -m pstats`, snakeviz, ...) and collapsed
+stacks (for flamegraph.pl, speedscope, ...). Handlers running in other
+processes (process pool, dask, ray) are not profiled.
+"""
+
+import logging
+import marshal
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Generator
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from types import FrameType
+from typing import Any, Callable
+
+from investigraph.settings import SETTINGS
+from investigraph.util import ensure_path
+
+log = logging.getLogger(__name__)
+
+INTERVAL = 0.005  # seconds between samples
+
+Func = tuple[str, int, str]  # pstats function key: (file, line, name)
+Stack = tuple[Func, ...]  # outermost first
+
+
+def get_stack(frame: FrameType | None) -> Stack:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def get_profile_path(dataset: str) -> Path:
+    return ensure_path(SETTINGS.data_root / dataset / "profile")
+
+
+class Profiler:
+    def __init__(self, interval: float | None = INTERVAL) -> None:
+        self.interval = interval
+        self.stacks: dict[str, Counter[Stack]] = defaultdict(Counter)
+        self.active: dict[int, list[str]] = {}  # thread id -> nested stages
+        self.lock = threading.Lock()
+        self.running = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.rounds = 0
+        self.seconds = 0.0
+
+    @property
+    def sample_seconds(self) -> float:
+        """
+        The actual time between samples (busy threads hold the gil longer than
+        the interval)
+        """
+        if not self.rounds:
+            return self.interval
+        return self.seconds / self.rounds
+
+    def start(self) -> None:
+        self.running.set()
+        self.thread = threading.Thread(
+            target=self.sample_loop, name="investigraph-profiler", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def sample_loop(self) -> None:
+        start = time.perf_counter()
+        while self.running.is_set():
+            self.sample()
+            self.rounds += 1
+            time.sleep(self.interval)
+        self.seconds = time.perf_counter() - start
+
+    def sample(self) -> None:
+        frames = sys._current_frames()
+        with self.lock:
+            active = {t: stages[-1] for t, stages in self.active.items() if stages}
+        for thread_id, stage in active.items():
+            frame = frames.get(thread_id)
+            if frame is not None:
+                self.stacks[stage][get_stack(frame)] += 1
+
+    @contextmanager
+    def enter(self, stage: str) -> Generator[None, None, None]:
+        """
+        Attribute the samples of the current thread to `stage` (the innermost
+        one, if stages are nested, e.g. the transform generator the loader
+        consumes)
+        """
+        thread_id = threading.get_ident()
+        with self.lock:
+            self.active.setdefault(thread_id, []).append(stage)
+            self.stacks[stage]  # write a profile even if no sample was taken
+        try:
+            yield
+        finally:
+            with self.lock:
+                stages = self.active[thread_id]
+                stages.pop()
+                if not stages:
+                    del self.active[thread_id]
+
+    def wrap(self, stage: str, func: Callable) -> Callable:
+        """
+        Profile calls of a stage handler, including the iteration of the
+        generators it returns (which is where extract and transform do their
+        work)
+        """
+
+        def iterate(res: Generator) -> Generator:
+            while True:
+                with self.enter(stage):
+                    try:
+                        item = next(res)
+                    except StopIteration as e:
+                        return e.value
+                yield item
+
+        @wraps(func)
+        def wrapper(*args, **kwargs) -> Any:
+            with self.enter(stage):
+                res = func(*args, **kwargs)
+            if isinstance(res, Generator):
+                return iterate(res)
+            return res
+
+        return wrapper
+
+    def get_collapsed(self, stage: str) -> str:
+        """
+        Collapsed stacks (`outer;inner;leaf count` per line)
+        """
+        lines = []
+        for stack, count in sorted(self.stacks[stage].items()):
+            names = ";".join(
+                f"{name} ({Path(file).name}:{line})" for file, line, name in stack
+            )
+            lines.append(f"{names} {count}")
+        return "\n".join(lines) + "\n"
+
+    def get_pstats(self, stage: str) -> dict[Func, tuple]:
+        """
+        The samples in the `pstats` format: every sample counts as one call
+        that took the time between two samples
+        """
+        interval = self.sample_seconds
+        calls: Counter[Func] = Counter()  # samples a function is on the stack
+        leaves: Counter[Func] = Counter()  # samples a function is running
+        callers: dict[Func, Counter[Func]] = defaultdict(Counter)
+        for stack, count in self.stacks[stage].items():
+            leaves[stack[-1]] += count
+            for func in set(stack):  # recursive calls count once
+                calls[func] += count
+            for caller, callee in set(zip(stack, stack[1:])):
+                callers[callee][caller] += count
+        stats = {}
+        for func, count in calls.items():
+            tt = leaves[func] * interval
+            ct = count * interval
+            stats[func] = (
+                count,
+                count,
+                tt,
+                ct,
+                {
+                    caller: (n, n, 0, n * interval)
+                    for caller, n in callers[func].items()
+                },
+            )
+        return stats
+
+    def write(self, path: Path) -> list[Path]:
+        """
+        Write `<stage>.pstats` and `<stage>.collapsed` per profiled stage
+        """
+        path = ensure_path(path)
+        paths = []
+        for stage in sorted(self.stacks):
+            pstats_path = path / f"{stage}.pstats"
+            with open(pstats_path, "wb") as fh:
+                marshal.dump(self.get_pstats(stage), fh)
+            collapsed_path = path / f"{stage}.collapsed"
+            collapsed_path.write_text(self.get_collapsed(stage))
+            paths.extend([pstats_path, collapsed_path])
+        return paths
+
+
+_profiler: Profiler | None = None
+
+
+def get_profiler() -> Profiler | None:
+    return _profiler
+
+
+@contextmanager
+def profiling(
+    path: Path, interval: float | None = INTERVAL
+) -> Generator[Profiler, None, None]:
+    """
+    Profile all stage handlers called within this context and write the
+    results to `path`
+    """
+    global _profiler
+    profiler = Profiler(interval)
+    _profiler = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _profiler = None
+        for p in profiler.write(path):
+            log.info(f"PROFILE: {p}")
@@ -0,0 +1,104 @@
+"""
+A process-wide pooled http session shared by fetching, source heads and
+resolvers so that requests to the same host re-use their connections.
+"""
+
+import threading
+import time
+from collections import Counter
+from functools import cache
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+from investigraph.settings import SETTINGS
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+def make_session() -> requests.Session:
+    retries = Retry(
+        total=SETTINGS.http_retries,
+        backoff_factor=SETTINGS.http_retry_backoff,
+        status_forcelist=RETRY_STATUS,
+        allowed_methods=("HEAD", "GET", "OPTIONS"),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=SETTINGS.http_pool_connections,
+        pool_maxsize=SETTINGS.http_pool_maxsize,
+        max_retries=retries,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not SETTINGS.http_keepalive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+@cache
+def get_session() -> requests.Session:
+    return make_session()
+
+
+@cache
+def get_stats() -> Counter:
+    """
+    Process-wide http counters, e.g. `head_hit` for HEAD requests that were
+    served from the cache and saved a round-trip
+    """
+    return Counter()
+
+
+class HeadCache:
+    """
+    Cache HEAD responses per url for `ttl` seconds. Concurrent lookups for the
+    same url wait for the first request instead of doing their own.
+    """
+
+    def __init__(self, ttl: int | float) -> None:
+        self.ttl = ttl
+        self.data: dict[str, tuple[float, CaseInsensitiveDict]] = {}
+        self.locks: dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    def get_lock(self, url: str) -> threading.Lock:
+        with self.lock:
+            if url not in self.locks:
+                self.locks[url] = threading.Lock()
+            return self.locks[url]
+
+    def get(self, url: str) -> CaseInsensitiveDict:
+        stats = get_stats()
+        with self.get_lock(url):
+            if url in self.data:
+                ts, headers = self.data[url]
+                if time.monotonic() - ts < self.ttl:
+                    stats["head_hit"] += 1
+                    return headers
+            res = get_session().head(url)
+            stats["head_miss"] += 1
+            if self.ttl:
+                self.data[url] = time.monotonic(), res.headers
+            return res.headers
+
+    def clear(self) -> None:
+        with self.lock:
+            self.data.clear()
+            self.locks.clear()
+
+
+@cache
+def get_head_cache() -> HeadCache:
+    return HeadCache(SETTINGS.http_head_ttl)
+
+
+def head(url: str) -> CaseInsensitiveDict:
+    """
+    Get the response headers of a HEAD request for `url`, at most one actual
+    request per url within `SETTINGS.http_head_ttl`
+    """
+    return get_head_cache().get(url)
@@ -25,6 +25,18 @@ class Settings(BaseSettings):
     redis_url: RedisDsn = Field("redis://localhost:6379")
     redis_prefix: str = f"investigraph:{VERSION}"
     redis_persist: bool = True
+    redis_max_connections: int | None = None
+
+    spool: bool = False  # use a local disk spool instead of (fake)redis
+    spool_path: Path | None = None  # default: `data_root/spool.db`
+
+    cache_serializer: Literal["pickle", "orjson", "msgpack"] = "pickle"
+    cache_compression: Literal["zstd", "lz4"] | None = None
+    cache_ttl: int | None = None  # seconds until batches of a run expire
+    cache_max_memory: int | None = None  # bytes, throttle extract above this
+    cache_throttle_timeout: int = 300  # max seconds to wait for free memory
+    cache_run_timeout: int = 86400  # running runs older than this are orphans
+    cache_run_heartbeat: int = 60  # seconds between refreshes of a running run
 
     task_cache: bool = False
     task_retries: int = 3
@@ -40,8 +52,29 @@ class Settings(BaseSettings):
     task_runner: Literal["dask", "ray"] | None = Field(
         None, alias="prefect_task_runner"
     )
+    executor: Literal["prefect", "local"] = "prefect"
+    local_workers: int | None = None  # threads of the local executor
 
     chunk_size: int = 1_000
+    chunk_target_bytes: int | None = None  # adaptive batches of about this size
+    chunk_target_seconds: float | None = None  # or this transform time
+    transform_processes: int = 0  # transform in a process pool, 0 to disable
+    fuse_transform_load: bool = False  # stream proxies straight into the loader
+    inflight_batches: int = 0  # max batches in transform/load, 0: unbounded
+    inflight_bytes: int = 0  # max bytes of these batches, 0: unbounded
+
+    metrics_prometheus_uri: str | None = None  # also export metrics as text here
+
+    http_pool_connections: int = 10  # number of hosts to keep pools for
+    http_pool_maxsize: int = 10  # connections per host
+    http_keepalive: bool = True
+    http_retries: int = 3
+    http_retry_backoff: float = 0.5
+    http_head_ttl: int = 300  # seconds to cache HEAD responses, 0 to disable
+
+    source_concurrency: int = 1  # sources to extract at the same time
+    prefetch: int = 0  # number of concurrent source downloads, 0 to disable
+    prefetch_per_host: int = 4
 
     ftm_store_uri: str = Field(
         PREFECT_API_DATABASE_CONNECTION_URL.value(), alias="ftm_store_uri"
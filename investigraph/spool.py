@@ -0,0 +1,247 @@
+"""
+A single-node, disk backed alternative to `fakeredis` for the batch cache.
+
+It implements the subset of the redis client api that `investigraph.cache.Cache`
+uses on top of a (memory-mapped) sqlite database, so that in-flight batches
+live on disk instead of in the python heap.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Generator, Iterable, Set
+
+MMAP_SIZE = 256 * 1024 * 1024  # 256 MB
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL
+);
+CREATE TABLE IF NOT EXISTS sets (
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires REAL,
+    PRIMARY KEY (key, value)
+);
+"""
+
+
+def _placeholders(items: list[Any]) -> str:
+    return ",".join("?" * len(items))
+
+
+class Spool:
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        self.con = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None, timeout=60
+        )
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=OFF")
+        self.con.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+        self.con.executescript(SCHEMA)
+
+    def __repr__(self) -> str:
+        return f"<Spool: {self.path}>"
+
+    def _now(self) -> float:
+        return time.time()
+
+    def _alive(self) -> str:
+        return "(expires IS NULL OR expires > %f)" % self._now()
+
+    def ping(self) -> bool:
+        with self.lock:
+            self.con.execute("SELECT 1")
+        return True
+
+    def set(self, key: str, value: bytes, ex: int | None = None) -> bool:
+        expires = self._now() + ex if ex else None
+        with self.lock:
+            self.con.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                (key, value, expires),
+            )
+        return True
+
+    def get(self, key: str) -> bytes | None:
+        with self.lock:
+            row = self.con.execute(
+                f"SELECT value FROM kv WHERE key = ? AND {self._alive()}", (key,)
+            ).fetchone()
+        if row is not None:
+            return row[0]
+
+    def getdel(self, key: str) -> bytes | None:
+        with self.lock, self.transaction():
+            res = self.get(key)
+            self.delete(key)
+        return res
+
+    def mget(self, keys: Iterable[str]) -> list[bytes | None]:
+        keys = list(keys)
+        if not keys:
+            return []
+        with self.lock:
+            rows = self.con.execute(
+                f"SELECT key, value FROM kv WHERE key IN ({_placeholders(keys)}) "
+                f"AND {self._alive()}",
+                keys,
+            ).fetchall()
+        values = dict(rows)
+        return [values.get(k) for k in keys]
+
+    def exists(self, *keys: str) -> int:
+        unique = list(set(keys))
+        if not unique:
+            return 0
+        with self.lock:
+            found = {
+                k
+                for (k,) in self.con.execute(
+                    f"SELECT key FROM kv WHERE key IN ({_placeholders(unique)}) "
+                    f"AND {self._alive()} UNION SELECT DISTINCT key FROM sets "
+                    f"WHERE key IN ({_placeholders(unique)}) AND {self._alive()}",
+                    [*unique, *unique],
+                )
+            }
+        return len([k for k in keys if k in found])
+
+    def delete(self, *keys: str) -> int:
+        keys = list(keys)
+        if not keys:
+            return 0
+        unique = list(set(keys))
+        with self.lock, self.transaction():
+            # like redis `DEL`: the number of (existing) keys removed
+            deleted = self.con.execute(
+                f"SELECT COUNT(*) FROM (SELECT key FROM kv WHERE key IN "
+                f"({_placeholders(unique)}) AND {self._alive()} UNION SELECT key "
+                f"FROM sets WHERE key IN ({_placeholders(unique)}) AND "
+                f"{self._alive()})",
+                [*unique, *unique],
+            ).fetchone()[0]
+            self.con.execute(
+                f"DELETE FROM kv WHERE key IN ({_placeholders(unique)})", unique
+            )
+            self.con.execute(
+                f"DELETE FROM sets WHERE key IN ({_placeholders(unique)})", unique
+            )
+        return deleted
+
+    def strlen(self, key: str) -> int:
+        with self.lock:
+            row = self.con.execute(
+                f"SELECT length(value) FROM kv WHERE key = ? AND {self._alive()}",
+                (key,),
+            ).fetchone()
+        if row is not None:
+            return row[0]
+        return 0
+
+    def expire(self, key: str, seconds: int) -> bool:
+        expires = self._now() + seconds
+        with self.lock:
+            updated = self.con.execute(
+                "UPDATE kv SET expires = ? WHERE key = ?", (expires, key)
+            ).rowcount
+            updated += self.con.execute(
+                "UPDATE sets SET expires = ? WHERE key = ?", (expires, key)
+            ).rowcount
+        return updated > 0
+
+    def scan_iter(self, match: str = "*") -> Generator[bytes, None, None]:
+        # redis glob patterns are (mostly) compatible with sqlite GLOB
+        with self.lock:
+            rows = self.con.execute(
+                f"SELECT key FROM kv WHERE key GLOB ? AND {self._alive()} UNION "
+                f"SELECT DISTINCT key FROM sets WHERE key GLOB ? AND {self._alive()}",
+                (match, match),
+            ).fetchall()
+        for (key,) in rows:
+            yield key.encode()
+
+    def sadd(self, key: str, *values: Any) -> int:
+        values = [v if isinstance(v, bytes) else str(v).encode() for v in values]
+        with self.lock:
+            # new members inherit an expiry set before on this key
+            row = self.con.execute(
+                "SELECT MAX(expires) FROM sets WHERE key = ?", (key,)
+            ).fetchone()
+            return self.con.executemany(
+                "INSERT OR IGNORE INTO sets (key, value, expires) VALUES (?, ?, ?)",
+                [(key, v, row[0]) for v in values],
+            ).rowcount
+
+    def smembers(self, key: str) -> Set[bytes]:
+        with self.lock:
+            rows = self.con.execute(
+                f"SELECT value FROM sets WHERE key = ? AND {self._alive()}", (key,)
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def flushall(self) -> bool:
+        with self.lock:
+            self.con.execute("DELETE FROM kv")
+            self.con.execute("DELETE FROM sets")
+        return True
+
+    def pipeline(self, transaction: bool | None = True) -> "SpoolPipeline":
+        return SpoolPipeline(self)
+
+    def transaction(self) -> "_Transaction":
+        return _Transaction(self.con)
+
+
+class _Transaction:
+    def __init__(self, con: sqlite3.Connection) -> None:
+        self.con = con
+        self.nested = False
+
+    def __enter__(self) -> None:
+        self.nested = self.con.in_transaction
+        if not self.nested:
+            self.con.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, *args) -> None:
+        if self.nested:
+            return
+        if exc_type is None:
+            self.con.execute("COMMIT")
+        else:
+            self.con.execute("ROLLBACK")
+
+
+class SpoolPipeline:
+    """
+    Queue commands and run them in one sqlite transaction, like a redis
+    pipeline
+    """
+
+    def __init__(self, spool: Spool) -> None:
+        self.spool = spool
+        self.commands: list[tuple[str, tuple[Any, ...], dict[str, Any]]] = []
+
+    def __getattr__(self, name: str) -> Any:
+        if not hasattr(self.spool, name):
+            raise AttributeError(name)
+
+        def _queue(*args, **kwargs) -> "SpoolPipeline":
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return _queue
+
+    def execute(self) -> list[Any]:
+        with self.spool.lock, self.spool.transaction():
+            res = [
+                getattr(self.spool, name)(*args, **kwargs)
+                for name, args, kwargs in self.commands
+            ]
+        self.commands = []
+        return res
@@ -1,3 +1,4 @@
+import hashlib
 import os
 import re
 from functools import cache
@@ -113,6 +114,13 @@ def pydantic_merge(m1: BaseModel, m2: BaseModel) -> BaseModel:
     return m1.__class__(**dict_merge(m1.model_dump(), m2.model_dump()))
 
 
+def get_shard(key: str, shards: int) -> int:
+    """
+    Deterministically assign `key` to one of `shards` (1-based)
+    """
+    return int(hashlib.sha1(key.encode()).hexdigest(), 16) % shards + 1
+
+
 def to_dict(obj: Any) -> dict[str, Any]:
     if hasattr(obj, "model_dump"):
         return obj.model_dump()
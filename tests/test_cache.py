@@ -1,4 +1,10 @@
-from investigraph.cache import get_cache
+import time
+from datetime import datetime
+
+import pytest
+
+from investigraph.cache import get_cache, get_serializer
+from investigraph.exceptions import ImproperlyConfigured
 from investigraph.util import make_proxy
 
 
@@ -40,3 +46,145 @@ def test_cache():
     assert cache.smembers(key) is None
 
     assert cache.flushall()
+
+
+@pytest.mark.parametrize(
+    "name,compression",
+    [
+        ("pickle", None),
+        ("orjson", None),
+        ("msgpack", None),
+        ("orjson", "zstd"),
+        ("msgpack", "lz4"),
+    ],
+)
+def test_cache_serializers(name, compression):
+    if name == "msgpack":
+        pytest.importorskip("msgpack")
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    if compression == "lz4":
+        pytest.importorskip("lz4")
+    serializer = get_serializer(name, compression)
+
+    proxy = make_proxy("Person", "id-alice")
+    proxy.add("name", "Alice")
+    records = [({"foo": 1, "bar": None, "baz": "x"}, 1), ({"foo": 2.5}, 2)]
+    for data in ("bar", 1, 1.0, {"foo": 1, "bar": True}, [proxy.to_dict()]):
+        assert serializer.loads(serializer.dumps(data)) == data
+    # tuples become lists, that's fine for unpacking (rec, ix)
+    for (rec, ix), (rec2, ix2) in zip(
+        serializer.loads(serializer.dumps(records)), records
+    ):
+        assert rec == rec2
+        assert ix == ix2
+
+    if name != "pickle":
+        data = serializer.loads(serializer.dumps({"date": datetime(2024, 1, 1)}))
+        assert data == {"date": "2024-01-01T00:00:00"}
+    if name == "orjson":
+        # records of sources without a header row have integer column names
+        data = serializer.loads(serializer.dumps({0: "a", 1: "b"}))
+        assert data == {"0": "a", "1": "b"}
+
+    with pytest.raises(ImproperlyConfigured):
+        get_serializer("foo")
+
+
+def test_cache_bulk():
+    cache = get_cache()
+    items = [[({"foo": i}, i)] for i in range(10)]
+    keys = [cache.set(item) for item in items]
+    assert cache.exists(*keys) == 10
+    assert cache.exists(*keys, "missing") == 10
+    assert cache.delete(*keys[:2], "missing") == 2
+    assert cache.exists(*keys) == 8
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2], delete=True) is not None
+    assert cache.exists(*keys) == 7
+    assert cache.delete() == 0
+
+    # emulated GETDEL (redis < 6.2)
+    key = cache.set("foo")
+    cache.can_getdel = False
+    assert cache.get(key, delete=True) == "foo"
+    assert cache.get(key) is None
+    cache.can_getdel = True
+
+
+def test_cache_keys():
+    cache = get_cache()
+    data = [({"foo": 1}, 1), ({"foo": 2}, 2)]
+    key = cache.set(data, prefix="source#0")
+    assert key.startswith("source#0#")
+    # deterministic for task caching
+    assert key == cache.set(data, prefix="source#0")
+    assert key != cache.set(data, prefix="source#1")
+    assert cache.get(key) == data
+
+
+def test_cache_runs(monkeypatch):
+    cache = get_cache()
+    cache.flushall()
+
+    failed = cache.bind("run-failed")
+    with pytest.raises(ValueError):
+        with failed.track_run():
+            shared = failed.set("shared")
+            orphan = failed.set("orphan")
+            raise ValueError
+    done = cache.bind("run-done")
+    with done.track_run():
+        assert done.set("shared") == shared
+        kept = done.set("kept")
+
+    runs = {r.run_id: r for r in cache.get_runs()}
+    assert runs["run-failed"].state == "failed"
+    assert runs["run-failed"].is_orphaned
+    assert runs["run-failed"].keys == 2
+    assert runs["run-failed"].size > 0
+    assert runs["run-done"].state == "completed"
+    assert not runs["run-done"].is_orphaned
+
+    # keys still used by other runs are kept
+    assert cache.evict_runs(["run-failed"]) == 1
+    assert cache.get(orphan, delete=False) is None
+    assert cache.get(shared, delete=False) == "shared"
+    assert cache.get(kept, delete=False) == "kept"
+    assert [r.run_id for r in cache.get_runs()] == ["run-done"]
+
+    # long runs are kept alive by the heartbeat
+    monkeypatch.setattr("investigraph.cache.SETTINGS.cache_run_heartbeat", 0.01)
+    running = cache.bind("run-running")
+    with running.track_run():
+        started = {r.run_id: r for r in cache.get_runs()}["run-running"]
+        time.sleep(0.1)
+        run = {r.run_id: r for r in cache.get_runs()}["run-running"]
+        assert run.state == "running"
+        assert run.updated_at > started.updated_at
+    run = {r.run_id: r for r in cache.get_runs()}["run-running"]
+    assert run.state == "completed"
+    cache.evict_runs(["run-running"])
+
+    # ttl
+    monkeypatch.setattr("investigraph.cache.SETTINGS.cache_ttl", 100)
+    key = cache.bind("run-ttl").set("ttl")
+    assert 0 < cache.cache.ttl(cache.get_key(key)) <= 100
+    assert 0 < cache.cache.ttl(cache.get_run_key("run-ttl", "SET")) <= 100
+
+    cache.flushall()
+
+
+def test_cache_throttle(monkeypatch):
+    cache = get_cache()
+    cache.flushall()
+    monkeypatch.setattr("investigraph.cache.SETTINGS.cache_max_memory", 10)
+    monkeypatch.setattr("investigraph.cache.SETTINGS.cache_throttle_timeout", 0)
+    cache.set("x" * 100)
+    assert cache.memory_usage() > 10
+    start = time.monotonic()
+    cache.throttle()  # gives up after the timeout
+    assert time.monotonic() - start < 1
+    cache.flushall()
+    assert cache.memory_usage() == 0
+    cache.throttle()
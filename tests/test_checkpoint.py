@@ -0,0 +1,50 @@
+from investigraph.model.checkpoint import Checkpoint, make_skip, write_checkpoint
+
+
+def test_checkpoint(tmp_path):
+    uri = (tmp_path / "checkpoint.jsonl").as_uri()
+    checkpoint = Checkpoint.load(uri)
+    assert not checkpoint.exists()
+    assert checkpoint.get_done("a.csv") == []
+
+    write_checkpoint(uri, source="a.csv", batch="a#0", start=1, end=10)
+    write_checkpoint(uri, source="a.csv", batch="a#1", start=11, end=20)
+    write_checkpoint(uri, source="a.csv", batch="a#2", start=21, end=25)
+    write_checkpoint(uri, source="a.csv", complete=True)
+    write_checkpoint(uri, source="b.csv", batch="b#0", start=1, end=10)
+    write_checkpoint(uri, loaded="a#2", fragment="fragments.json.3")
+    write_checkpoint(uri, loaded="a#0", fragment="fragments.json.1")
+    write_checkpoint(uri, loaded="b#0", fragment="fragments.json.2")
+    with open(tmp_path / "checkpoint.jsonl", "a") as fh:
+        fh.write('{"loaded": "a#1", "fragm')  # crashed while writing
+
+    checkpoint = Checkpoint.load(uri)
+    assert checkpoint.exists()
+    assert checkpoint.get_done("a.csv") == [(1, 10), (21, 25)]
+    assert not checkpoint.is_complete("a.csv")
+    assert not checkpoint.is_complete("b.csv")  # extraction didn't finish
+    assert checkpoint.get_fragment_uris("a.csv") == [
+        "fragments.json.1",
+        "fragments.json.3",
+    ]
+    assert len(checkpoint.get_fragment_uris()) == 3
+
+    skip = make_skip(checkpoint.get_done("a.csv"))
+    assert [ix for ix in range(1, 27) if not skip(ix)] == [*range(11, 21), 26]
+
+    write_checkpoint(uri, loaded="a#1", fragment="fragments.json.4")
+    assert Checkpoint.load(uri).is_complete("a.csv")
+
+    # a batch of a resumed run spans the records it skipped
+    write_checkpoint(uri, source="c.csv", batch="c#0", start=1, end=10)
+    write_checkpoint(uri, source="c.csv", batch="c#1", start=21, end=25)
+    write_checkpoint(uri, source="c.csv", batch="c#2", start=11, end=30)
+    for key in ("c#0", "c#1", "c#2"):
+        write_checkpoint(uri, loaded=key, fragment=None)
+    done = Checkpoint.load(uri).get_done("c.csv")
+    assert done == [(1, 30)]
+    skip = make_skip(done)
+    assert [ix for ix in range(1, 32) if not skip(ix)] == [31]
+
+    checkpoint.delete()
+    assert not checkpoint.exists()
@@ -0,0 +1,34 @@
+from investigraph.chunk import MAX_SIZE, MIN_SIZE, ChunkSizer
+
+
+def test_chunk_sizer():
+    sizer = ChunkSizer(1000)
+    assert not sizer.is_adaptive
+    sizer.observe_bytes(1000, 10_000_000)
+    assert sizer.size == 1000
+
+    sizer = ChunkSizer(1000, target_bytes=1_000_000)
+    assert sizer.is_adaptive
+    sizer.observe_bytes(1000, 10_000_000)  # 10 KB per record
+    assert sizer.size == 100
+    sizer.observe_bytes(100, 100_000)  # 1 KB per record, smoothed
+    assert sizer.size == 181
+    sizer.observe_bytes(10, 10)
+    sizer.observe_bytes(10, 10)
+    sizer.observe_bytes(10, 10)
+    assert MIN_SIZE < sizer.size < MAX_SIZE
+
+    # the smaller size wins
+    sizer = ChunkSizer(1000, target_bytes=1_000_000, target_seconds=1)
+    sizer.observe_bytes(1000, 1_000_000)
+    assert sizer.size == 1000
+    sizer.observe_seconds(1000, 10)
+    assert sizer.size == 100
+
+    sizer = ChunkSizer(1000, target_seconds=0.001)
+    sizer.observe_seconds(1000, 10)
+    assert sizer.size == MIN_SIZE
+
+    sizer.add(100)
+    sizer.add(10)
+    assert sizer.get_summary() == "2 batches of 10-100 records (avg 55)"
@@ -5,6 +5,7 @@ from ftmq.util import make_proxy
 from typer.testing import CliRunner
 
 from investigraph.cli import cli
+from investigraph.settings import SETTINGS
 
 runner = CliRunner()
 
@@ -19,6 +20,11 @@ def test_cli_run(fixtures_path: Path):
     result = runner.invoke(cli, ["run", "-c", config])
     assert result.exit_code == 0
 
+    result = runner.invoke(cli, ["run", "-c", config, "--executor", "local"])
+    assert result.exit_code == 0
+    result = runner.invoke(cli, ["run", "-c", config, "--executor", "dask"])
+    assert result.exit_code > 0
+
     # no arguments
     result = runner.invoke(cli, ["run"])
     assert result.exit_code > 0
@@ -53,3 +59,17 @@ def test_cli_inspect(fixtures_path: Path):
     )
     assert result.exit_code == 0
     assert len(result.stdout.strip().split("\n")) == 1
+
+
+def test_cli_profile(fixtures_path: Path):
+    config = str(fixtures_path / "gdho" / "config.local.yml")
+    result = runner.invoke(cli, ["inspect", config, "-t", "--profile"])
+    assert result.exit_code == 0
+    path = SETTINGS.data_root / "gdho" / "profile"
+    assert (path / "transform.pstats").exists()
+    assert (path / "transform.collapsed").exists()
+
+    result = runner.invoke(cli, ["run", "-c", config, "--profile"])
+    assert result.exit_code == 0
+    for stage in ("seed", "extract", "transform", "load", "aggregate"):
+        assert (path / f"{stage}.pstats").exists()
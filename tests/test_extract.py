@@ -1,8 +1,10 @@
 from typing import Any
 
+import numpy as np
+import pandas as pd
 import pytest
 
-from investigraph.logic.extract import extract_pandas
+from investigraph.logic.extract import extract_pandas, yield_pandas
 from investigraph.model import Config, Resolver, Source
 
 
@@ -93,3 +95,37 @@ def test_extract_from_config(ec_meetings_local: Config, gdho: Config):
             tested = True
             break
     assert tested
+
+
+def test_extract_yield_pandas(fixtures_path):
+    def _legacy(df: pd.DataFrame):
+        for _, row in df.iterrows():
+            yield dict(row.replace(np.nan, None))
+
+    df = pd.read_csv(fixtures_path / "all-authorities.csv")
+    assert list(yield_pandas(df)) == list(_legacy(df))
+
+    df = pd.read_excel(fixtures_path / "ec-meetings.xlsx", skiprows=1)
+    records = list(yield_pandas(df))
+    assert len(records) == 12482
+    for rec in records:
+        assert not any(pd.isna(v) for v in rec.values() if v is not None)
+
+    # all-numeric rows are upcast to float, like with `iterrows`
+    df = pd.DataFrame({"a": [1, 2], "b": [1.5, np.nan]})
+    records = list(yield_pandas(df))
+    assert [{k: str(v) for k, v in r.items()} for r in records] == [
+        {k: str(v) for k, v in r.items()} for r in _legacy(df)
+    ]
+    assert records[0] == {"a": 1.0, "b": 1.5}
+    assert isinstance(records[0]["a"], float)
+    assert records[1]["b"] is None
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+    assert list(yield_pandas(df)) == [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}]
+    assert isinstance(next(yield_pandas(df))["a"], int)
+
+    df = pd.DataFrame({"a": [1.0, np.nan], "b": ["x", None], "c": [pd.NaT, None]})
+    assert list(yield_pandas(df)) == [
+        {"a": 1.0, "b": "x", "c": None},
+        {"a": None, "b": None, "c": None},
+    ]
@@ -0,0 +1,179 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+import pytest
+import requests
+from fsspec.core import url_to_fs
+
+from investigraph.logic import fetch
+from investigraph.session import get_stats
+from investigraph.settings import SETTINGS
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Serve files with support for `Range: bytes=<start>-` (and `If-Range` with
+    the `etag`) and optionally drop the connection after `interrupt_at` bytes
+    to simulate a broken transfer
+    """
+
+    interrupt_at: int | None = None
+    etag: str = '"v1"'
+
+    def do_GET(self):
+        with open(self.translate_path(self.path), "rb") as fh:
+            data = fh.read()
+        total = len(data)
+        start = 0
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and if_range in (None, self.etag):
+            start = int(range_header.split("=")[1].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{total - 1}/{total}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(total - start))
+        self.end_headers()
+        body = data[start:]
+        if self.interrupt_at is not None:
+            self.wfile.write(body[: self.interrupt_at])
+            RangeRequestHandler.interrupt_at = None
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def range_server(fixtures_path):
+    handler = partial(RangeRequestHandler, directory=str(fixtures_path))
+    server = ThreadingHTTPServer(("localhost", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://localhost:{server.server_address[1]}"
+    server.shutdown()
+
+
+def _archived(key: str) -> bytes:
+    fs, root = url_to_fs(SETTINGS.archive_uri)
+    with fs.open(f"{root}/{key}", "rb") as fh:
+        return fh.read()
+
+
+def test_fetch_download_file(fixtures_path):
+    data = (fixtures_path / "ec-meetings.xlsx").read_bytes()
+    key = fetch.download_file("http://localhost:8000/ec-meetings.xlsx", cache=False)
+    assert key == hashlib.sha1(data).hexdigest()
+    assert _archived(key) == data
+
+    key = fetch.download_file(
+        "http://localhost:8000/ec-meetings.xlsx", key="meetings.xlsx", cache=False
+    )
+    assert key == "meetings.xlsx"
+    assert _archived(key) == data
+
+
+def test_fetch_download_file_resume(fixtures_path, range_server, monkeypatch):
+    data = (fixtures_path / "ec-meetings.xlsx").read_bytes()
+    url = f"{range_server}/ec-meetings.xlsx"
+
+    # interrupted transfer leaves a partial file
+    RangeRequestHandler.interrupt_at = 100_000
+    with pytest.raises(requests.exceptions.RequestException):
+        fetch.download_file(url, cache=False)
+
+    partial = fetch.get_partial_path(url)
+    # the received bytes are on disk, except for an incomplete last chunk
+    offset = 100_000 - 100_000 % fetch.DOWNLOAD_CHUNK_SIZE
+    assert partial.stat().st_size == offset > 0
+    fs, root = url_to_fs(SETTINGS.archive_uri)
+    assert not fs.exists(f"{root}/.partial")
+
+    ranges = []
+    _get = fetch.get_session().get
+
+    def _tracked_get(*args, **kwargs):
+        headers = kwargs["headers"]
+        ranges.append((headers.get("Range"), headers.get("If-Range")))
+        return _get(*args, **kwargs)
+
+    monkeypatch.setattr(fetch.get_session(), "get", _tracked_get)
+    key = fetch.download_file(url, cache=False)
+    assert ranges == [(f"bytes={offset}-", '"v1"')]
+    assert key == hashlib.sha1(data).hexdigest()
+    assert _archived(key) == data
+    assert not partial.exists()
+
+    # resource changed in between: start over
+    RangeRequestHandler.interrupt_at = 100_000
+    with pytest.raises(requests.exceptions.RequestException):
+        fetch.download_file(url, cache=False)
+    RangeRequestHandler.etag = '"v2"'
+    ranges.clear()
+    key = fetch.download_file(url, cache=False)
+    assert ranges == [(f"bytes={offset}-", '"v1"'), (None, None)]
+    assert key == hashlib.sha1(data).hexdigest()
+    assert _archived(key) == data
+    RangeRequestHandler.etag = '"v1"'
+
+    # server without range support: start over
+    monkeypatch.undo()
+    url = "http://localhost:8000/ec-meetings.xlsx"
+    partial = fetch.get_partial_path(url)
+    partial.write_bytes(b"garbage")
+    partial.with_suffix(".validator").write_text('"v1"')
+    key = fetch.download_file(url, cache=False)
+    assert key == hashlib.sha1(data).hexdigest()
+    assert _archived(key) == data
+
+
+def test_fetch_download_file_concurrent(fixtures_path, range_server):
+    data = (fixtures_path / "ec-meetings.xlsx").read_bytes()
+    url = f"{range_server}/ec-meetings.xlsx"
+    with ThreadPoolExecutor(4) as pool:
+        keys = list(pool.map(lambda _: fetch.download_file(url, cache=False), range(4)))
+    assert set(keys) == {hashlib.sha1(data).hexdigest()}
+    assert _archived(keys[0]) == data
+
+
+def test_fetch_cold_cache():
+    stats = get_stats()
+    misses = stats["get_miss"]
+    url = f"http://localhost:8000/all-authorities.csv?run={uuid4()}"
+    assert not fetch.STORE.exists(fetch.get_url_key(url))
+    res = fetch.get(url)
+    assert res.ok
+    assert stats["get_miss"] == misses + 1
+    assert fetch.STORE.exists(fetch.get_url_key(url))
+
+
+def test_fetch_revalidate():
+    stats = get_stats()
+    url = f"http://localhost:8000/all-authorities.csv?run={uuid4()}"
+    res = fetch.get(url)
+    assert res.ok
+    assert stats["get_miss"] >= 1
+    hits, revalidated = stats["get_hit"], stats["get_304"]
+
+    # served from cache after a 304 answer (http.server checks If-Modified-Since)
+    cached = fetch.get(url)
+    assert cached.content == res.content
+    assert stats["get_304"] == revalidated + 1
+
+    # no revalidation
+    fetch.get(url, url_key_only=True)
+    assert stats["get_hit"] == hits + 1
+    assert stats["get_304"] == revalidated + 1
+
+    # no cache
+    misses = stats["get_miss"]
+    fetch.get(url, cache=False)
+    assert stats["get_miss"] == misses + 1
@@ -0,0 +1,74 @@
+import os
+from uuid import uuid4
+
+from ftmq.io import smart_read_proxies
+
+from investigraph import pipeline
+from investigraph.model import FlowOptions
+from investigraph.model.manifest import Manifest
+
+CONFIG = """
+name: {name}
+seed:
+  glob: {path}/*.csv
+transform:
+  queries:
+    - entities:
+        body:
+          schema: PublicBody
+          key: URL name
+          properties:
+            name:
+              column: Name
+"""
+
+
+def test_manifest_incremental(fixtures_path, tmp_path, monkeypatch):
+    data = (fixtures_path / "all-authorities.csv").read_bytes()
+    (tmp_path / "a.csv").write_bytes(data)
+    (tmp_path / "b.csv").write_bytes(b"\n".join(data.split(b"\n")[:11]))
+    config = tmp_path / "config.yml"
+    config.write_text(CONFIG.format(name=f"test_{uuid4().hex}", path=tmp_path))
+    options = FlowOptions(config=str(config), incremental=True)
+
+    processed = []
+    _run_pipeline = pipeline.run_pipeline
+
+    def _tracked(ctx, *args, **kwargs):
+        processed.append(ctx.source.uri)
+        return _run_pipeline(ctx, *args, **kwargs)
+
+    monkeypatch.setattr(pipeline, "run_pipeline", _tracked)
+
+    out = pipeline.run(options)
+    assert len(processed) == 2
+    assert len([p for p in smart_read_proxies(out.entities_uri)]) == 151
+    manifest = Manifest.load(out.manifest_uri)
+    assert len(manifest.sources) == 2
+    for state in manifest.sources.values():
+        assert state.checksum
+        assert state.size
+        assert state.fragment_uris
+
+    # nothing changed
+    processed.clear()
+    out = pipeline.run(options)
+    assert not processed
+    assert len([p for p in smart_read_proxies(out.entities_uri)]) == 151
+
+    # only modification time changed
+    os.utime(tmp_path / "a.csv", (0, 0))
+    out = pipeline.run(options)
+    assert not processed
+
+    # changed content
+    (tmp_path / "b.csv").write_bytes(b"\n".join(data.split(b"\n")[:21]))
+    out = pipeline.run(options)
+    assert len(processed) == 1
+    assert processed[0].endswith("b.csv")
+    assert len([p for p in smart_read_proxies(out.entities_uri)]) == 151
+
+    # not incremental
+    processed.clear()
+    pipeline.run(FlowOptions(config=str(config)))
+    assert len(processed) == 2
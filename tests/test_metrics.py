@@ -0,0 +1,53 @@
+from investigraph.metrics import BUCKETS, Histogram, Metrics
+
+
+def test_metrics_histogram():
+    histogram = Histogram()
+    histogram.observe(0.01)
+    histogram.observe(0.2)
+    histogram.observe(400)
+    assert histogram.count == 3
+    assert histogram.counts[0] == 1
+    assert histogram.counts[BUCKETS.index(0.25)] == 1
+    assert histogram.counts[-1] == 1  # +Inf
+    assert Histogram().counts == [0] * (len(BUCKETS) + 1)
+
+
+def test_metrics():
+    metrics = Metrics()
+    metrics.observe("extract", 2, records_in=100, records_out=100, bytes_out=1000)
+    metrics.observe("extract", 0.5, records_in=50, records_out=50, bytes_out=500)
+    extract = metrics.stages["extract"]
+    assert extract.batches == 2
+    assert extract.records_out == 150
+    assert extract.bytes_out == 1500
+    assert extract.records_per_second == 60
+    assert extract.latency.count == 2
+
+    metrics.cache_hit(True)
+    metrics.cache_hit(True)
+    metrics.cache_hit(False)
+    assert metrics.cache.hits == 2
+    assert round(metrics.cache.hit_rate, 2) == 0.67
+
+    metrics.update_rss()
+    assert metrics.process_peak_rss > 0
+
+    text = metrics.to_prometheus("test")
+    assert "# TYPE investigraph_stage_batch_seconds histogram" in text
+    assert (
+        'investigraph_stage_records_out_total{dataset="test",stage="extract"} 150'
+        in text
+    )
+    assert (
+        'investigraph_stage_batch_seconds_bucket{dataset="test",stage="extract",'
+        'le="+Inf"} 2' in text
+    )
+    assert 'investigraph_cache_hits_total{dataset="test"} 2' in text
+
+    data = Metrics.model_validate_json(metrics.model_dump_json())
+    assert data.stages["extract"].records_in == 150
+
+    metrics.clear()
+    assert metrics.stages == {}
+    assert metrics.cache.hits == 0
@@ -1,12 +1,29 @@
 # from importlib import reload
+from pathlib import Path
+from uuid import uuid4
 
 import cloudpickle
+import orjson
+import pandas as pd
+import pytest
+from anystore.io import smart_read
 from ftmq.io import smart_read_proxies
 from ftmstore import get_dataset
 
+from investigraph import pipeline
+from investigraph.exceptions import ImproperlyConfigured
+from investigraph.logic.aggregate import buffering, get_buffer
+from investigraph.metrics import Metrics
 from investigraph.model import FlowOptions
+from investigraph.model.checkpoint import Checkpoint
 from investigraph.model.context import init_context
-from investigraph.pipeline import run
+from investigraph.pipeline import (
+    get_task_cache_key,
+    get_transform_load_cache_key,
+    merge,
+    run,
+    run_local,
+)
 from investigraph.settings import SETTINGS
 
 
@@ -87,3 +104,271 @@ def test_pipeline_chunk_size():
 #     # FIXME this still doesn't work
 #     assert run(options)
 #     assert run(options)
+
+
+def test_pipeline_sharded(fixtures_path, tmp_path):
+    df = pd.read_csv(fixtures_path / "all-authorities.csv")
+    for ix in range(4):
+        df[ix::4].to_csv(tmp_path / f"part-{ix}.csv", index=False)
+    config = tmp_path / "config.yml"
+    config.write_text(
+        f"""
+name: test_sharded_{uuid4().hex}
+seed:
+  glob: {tmp_path}/*.csv
+transform:
+  queries:
+    - entities:
+        body:
+          schema: PublicBody
+          key: URL name
+          properties:
+            name:
+              column: Name
+"""
+    )
+    processed = 0
+    for shard in ("1/2", "2/2"):
+        out = run(FlowOptions(config=str(config), shard=shard))
+        assert out.shard
+        processed += len(orjson.loads(smart_read(out.get_shard_uri(out.shard))))
+    assert processed >= 4  # at least one fragment part per source
+
+    out = merge(FlowOptions(config=str(config)), 2)
+    proxies = [p for p in smart_read_proxies(out.entities_uri)]
+    assert len(proxies) == 151
+
+    with pytest.raises(ImproperlyConfigured):
+        merge(FlowOptions(config=str(config)), 3)
+    with pytest.raises(ImproperlyConfigured):
+        FlowOptions(config=str(config), shard="3/2")
+
+
+def test_pipeline_inflight_window(monkeypatch):
+    monkeypatch.setattr("investigraph.pipeline.SETTINGS.inflight_batches", 1)
+    options = FlowOptions(
+        config="./tests/fixtures/eu_authorities.local.yml",
+        chunk_size=10,
+    )
+    out = run(options)
+    proxies = [p for p in smart_read_proxies(out.entities_uri)]
+    assert len(proxies) == 151
+
+    monkeypatch.setattr("investigraph.pipeline.SETTINGS.inflight_batches", 0)
+    monkeypatch.setattr("investigraph.pipeline.SETTINGS.inflight_bytes", 1024)
+    out = run(options)
+    proxies = [p for p in smart_read_proxies(out.entities_uri)]
+    assert len(proxies) == 151
+
+
+def test_pipeline_transform_processes(monkeypatch):
+    monkeypatch.setattr("investigraph.pipeline.SETTINGS.transform_processes", 2)
+    options = FlowOptions(
+        config="./tests/fixtures/eu_authorities.local.yml",
+        chunk_size=50,
+    )
+    out = run(options)
+    proxies = [p for p in smart_read_proxies(out.entities_uri)]
+    assert len(proxies) == 151
+
+
+def test_pipeline_fuse_transform_load(monkeypatch):
+    monkeypatch.setattr("investigraph.pipeline.SETTINGS.fuse_transform_load", True)
+    options = FlowOptions(
+        config="./tests/fixtures/eu_authorities.local.yml",
+        chunk_size=50,
+    )
+    out = run(options)
+    proxies = [p for p in smart_read_proxies(out.entities_uri)]
+    assert len(proxies) == 151
+    assert len(list(out.fragment_uris)) == 4
+    for uri in out.fragment_uris:
+        assert "#" not in uri
+
+    # task cache keys of the fused and the separate stage don't collide
+    params = {"ckey": "records"}
+    assert get_transform_load_cache_key(None, params) != get_task_cache_key(
+        None, params
+    )
+
+
+def test_pipeline_source_concurrency(monkeypatch, fixtures_path, tmp_path):
+    df = pd.read_csv(fixtures_path / "all-authorities.csv")
+    for ix in range(6):
+        df[ix::6].to_csv(tmp_path / f"part-{ix}.csv", index=False)
+    config = tmp_path / "config.yml"
+    config.write_text(
+        f"""
+name: test_concurrent_{uuid4().hex}
+seed:
+  glob: {tmp_path}/*.csv
+transform:
+  queries:
+    - entities:
+        body:
+          schema: PublicBody
+          key: URL name
+          properties:
+            name:
+              column: Name
+"""
+    )
+    aggregated = []
+    _aggregate_fragments = pipeline.aggregate_fragments
+
+    def _tracked(ctx, fragments, executor):
+        aggregated.append(fragments)
+        return _aggregate_fragments(ctx, fragments, executor)
+
+    monkeypatch.setattr(pipeline, "aggregate_fragments", _tracked)
+    options = FlowOptions(config=str(config), chunk_size=10)
+    out = run(options)
+    fragments = list(out.fragment_uris)
+
+    monkeypatch.setattr("investigraph.pipeline.SETTINGS.source_concurrency", 3)
+    out = run(options)
+    # fragment parts are in source order, whichever source finished first
+    assert aggregated[1] == aggregated[0]
+    assert sorted(out.fragment_uris) == sorted(fragments)
+    proxies = [p for p in smart_read_proxies(out.entities_uri)]
+    assert len(proxies) == 151
+
+    # batches are submitted while the sources are still extracted, within the
+    # in-flight window
+    monkeypatch.setattr("investigraph.pipeline.SETTINGS.inflight_batches", 1)
+    out = run_local(options)
+    assert sorted(out.fragment_uris) == sorted(fragments)
+
+
+def test_pipeline_streaming_aggregation(fixtures_path, tmp_path):
+    config = tmp_path / "config.yml"
+    config.write_text(
+        f"""
+name: test_streaming_{uuid4().hex}
+extract:
+  sources:
+    - uri: {fixtures_path / "all-authorities.csv"}
+transform:
+  queries:
+    - entities:
+        body:
+          schema: PublicBody
+          key: URL name
+          properties:
+            name:
+              column: Name
+aggregate:
+  handler: streaming
+"""
+    )
+    out = run(FlowOptions(config=str(config), chunk_size=50))
+    assert out.config.aggregate.is_streaming
+    proxies = [p for p in smart_read_proxies(out.entities_uri)]
+    assert len(proxies) == 151
+
+    # the buffer only lives for the run
+    ctx = init_context(out.config, out.config.extract.sources[0])
+    assert get_buffer(ctx) is None
+    with buffering(ctx):
+        buffer = get_buffer(ctx)
+        assert buffer is not None
+        # a retried load doesn't merge its proxies again
+        buffer.add_part("part-1", proxies[:10])
+        buffer.add_part("part-1", proxies[:10])
+        assert buffer.fragments == 10
+    assert get_buffer(ctx) is None
+
+
+def test_pipeline_resume(monkeypatch):
+    # keep the checkpoint of a run as if it had failed
+    monkeypatch.setattr("investigraph.pipeline.Checkpoint.delete", lambda _: None)
+    options = FlowOptions(
+        config="./tests/fixtures/eu_authorities.local.yml",
+        chunk_size=50,
+    )
+    out = run(options)
+    fragments = sorted(out.fragment_uris)
+    assert len(fragments) == 4
+    path = Path(out.checkpoint_uri[7:])
+    lines = [orjson.loads(line) for line in path.read_text().splitlines()]
+    # "lose" the last loaded batch and the end of the extraction
+    lost = [ix for ix, line in enumerate(lines) if "loaded" in line][-1]
+    path.write_text(
+        "".join(
+            orjson.dumps(line).decode() + "\n"
+            for ix, line in enumerate(lines)
+            if ix != lost and not line.get("complete")
+        )
+    )
+
+    # the checkpoint is read once per run, not per source
+    loaded = []
+    _load = Checkpoint.load
+
+    def _tracked_load(uri):
+        loaded.append(uri)
+        return _load(uri)
+
+    monkeypatch.setattr("investigraph.pipeline.Checkpoint.load", _tracked_load)
+    resumed = run(options.model_copy(update={"resume": out.run_id}))
+    assert loaded == [out.checkpoint_uri]
+    assert resumed.checkpoint_uri == out.checkpoint_uri
+    assert sorted(resumed.fragment_uris) == fragments
+    proxies = [p for p in smart_read_proxies(resumed.entities_uri)]
+    assert len(proxies) == 151
+
+    with pytest.raises(ImproperlyConfigured):
+        run(options.model_copy(update={"resume": "unknown"}))
+
+
+def test_pipeline_adaptive_chunk_size(monkeypatch):
+    monkeypatch.setattr("investigraph.chunk.SETTINGS.chunk_target_bytes", 5_000)
+    options = FlowOptions(config="./tests/fixtures/eu_authorities.local.yml")
+    out = run(options)
+    # 151 records of a few hundred bytes each don't fit into one 5 KB batch
+    assert len(list(out.fragment_uris)) > 1
+    proxies = [p for p in smart_read_proxies(out.entities_uri)]
+    assert len(proxies) == 151
+
+
+def test_pipeline_local_executor(monkeypatch):
+    options = FlowOptions(
+        config="./tests/fixtures/eu_authorities.local.yml",
+        chunk_size=50,
+    )
+    out = run_local(options, workers=2)
+    assert out.run_id
+    assert len(list(out.fragment_uris)) == 4
+    proxies = [p for p in smart_read_proxies(out.entities_uri)]
+    assert len(proxies) == 151
+
+    monkeypatch.setattr("investigraph.pipeline.SETTINGS.fuse_transform_load", True)
+    monkeypatch.setattr("investigraph.pipeline.SETTINGS.source_concurrency", 2)
+    out = run_local(options)
+    proxies = [p for p in smart_read_proxies(out.entities_uri)]
+    assert len(proxies) == 151
+
+
+def test_pipeline_metrics(monkeypatch, tmp_path):
+    prometheus = tmp_path / "investigraph.prom"
+    monkeypatch.setattr(
+        "investigraph.pipeline.SETTINGS.metrics_prometheus_uri", str(prometheus)
+    )
+    options = FlowOptions(
+        config="./tests/fixtures/eu_authorities.local.yml",
+        chunk_size=50,
+    )
+    out = run(options)
+    metrics = out.metrics
+    assert metrics.stages["extract"].batches == 4
+    assert metrics.stages["extract"].records_out == 151
+    assert metrics.stages["transform"].records_in == 151
+    assert metrics.stages["load"].records_in == metrics.stages["transform"].records_out
+    assert metrics.stages["aggregate"].records_out == 151
+    assert metrics.cache.hits > 0
+    assert metrics.process_peak_rss > 0
+    assert out.metrics_uri.endswith("/metrics.json")
+    assert Metrics.model_validate_json(smart_read(out.metrics_uri)) == metrics
+    assert "investigraph_stage_batches_total" in prometheus.read_text()
+    # replaced atomically, without leftover temporary files
+    assert [p.name for p in tmp_path.iterdir()] == ["investigraph.prom"]
@@ -0,0 +1,33 @@
+import pandas as pd
+
+from investigraph.logic.extract import yield_pandas
+from investigraph.logic.transform import transform_batch
+from investigraph.model.context import init_context
+from investigraph.pool import TransformPool
+
+
+def normalize(proxies: list[dict]) -> list[dict]:
+    # multi-valued properties come in set order, which depends on the hash seed
+    # of the (spawned) worker process
+    return [
+        {**p, "properties": {k: sorted(v) for k, v in p["properties"].items()}}
+        for p in proxies
+    ]
+
+
+def test_pool(eu_authorities):
+    source = eu_authorities.extract.sources[0]
+    ctx = init_context(eu_authorities, source)
+    df = pd.read_csv(source.uri)
+    records = [(rec, ix) for ix, rec in enumerate(yield_pandas(df), 1)]
+    proxies = transform_batch(ctx, records)
+    assert len(proxies) == 151
+
+    pool = TransformPool(eu_authorities, 2)
+    try:
+        res = pool.transform_records(ctx, records[:50])
+        assert normalize(res) == normalize(proxies[:50])
+        res = pool.transform_records(ctx, records[50:])
+        assert normalize(res) == normalize(proxies[50:])
+    finally:
+        pool.shutdown()
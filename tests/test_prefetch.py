@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import Counter
+
+from investigraph.logic import fetch
+from investigraph.logic.prefetch import prefetch
+from investigraph.model import Config, Resolver, Source
+from investigraph.model.context import BaseContext
+from investigraph.session import get_stats
+
+BASE_URI = "http://localhost:8000/%s"
+FILES = ["all-authorities.csv", "ec-meetings.xlsx", "gdho/organizations.csv"]
+
+
+def test_prefetch(monkeypatch):
+    config = Config(name="test")
+    ctx = BaseContext.from_config(config)
+    sources = [
+        Source(uri=BASE_URI % f, name=f"{f}-{i}") for i in range(3) for f in FILES
+    ]
+    sources.append(Source(uri="./all-authorities.csv"))  # not prefetched
+
+    lock = threading.Lock()
+    active = Counter()
+    max_active = Counter()
+    total = Counter()
+    _download = fetch.download_file
+
+    def _tracked_download(url, *args, **kwargs):
+        with lock:
+            active[url] += 1
+            active["all"] += 1
+            total["calls"] += 1
+            max_active[url] = max(max_active[url], active[url])
+            max_active["all"] = max(max_active["all"], active["all"])
+        time.sleep(0.1)
+        try:
+            return _download(url, *args, **kwargs)
+        finally:
+            with lock:
+                active[url] -= 1
+                active["all"] -= 1
+
+    monkeypatch.setattr(fetch, "download_file", _tracked_download)
+    contexts = [ctx.from_source(s) for s in sources]
+    result = [c for c in prefetch(contexts, workers=4, per_host=2)]
+
+    # order is preserved
+    assert [c.source.name for c in result] == [s.name for s in sources]
+    assert total["calls"] == 9
+    assert max_active["all"] <= 2  # all sources are on the same host
+    assert max_active["all"] > 1
+    for c in result[:-1]:
+        assert c.source.archive_uri is not None
+    assert result[-1].source.archive_uri is None
+
+    # resolver reads the archived copy without any further round-trip
+    def _fail(*args, **kwargs):
+        raise AssertionError("no request expected")
+
+    monkeypatch.setattr(fetch, "get", _fail)
+    stats = get_stats().copy()
+    res = Resolver(source=result[0].source)
+    res._resolve_http()
+    assert res.get_cache_key()
+    assert res.source.stream is True
+    assert b"European Council" in b"".join(res.iter_lines())
+    res = Resolver(source=result[1].source)
+    assert res.get_content().startswith(b"PK")  # xlsx
+    assert get_stats()["head_miss"] == stats["head_miss"]
+
+    # disabled
+    result = [c for c in prefetch(contexts, workers=0)]
+    assert len(result) == len(contexts)
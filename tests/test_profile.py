@@ -0,0 +1,50 @@
+import pstats
+import time
+
+from investigraph.profile import Profiler, get_profiler, profiling
+
+
+def _busy(seconds: float) -> None:
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        pass
+
+
+def _records(seconds: float):
+    for ix in range(3):
+        _busy(seconds)
+        yield ix
+
+
+def test_profile(tmp_path):
+    assert get_profiler() is None
+    with profiling(tmp_path) as profiler:
+        assert get_profiler() is profiler
+        extract = profiler.wrap("extract", _records)
+        load = profiler.wrap("load", _busy)
+        assert list(extract(0.05)) == [0, 1, 2]
+        load(0.1)
+    assert get_profiler() is None
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "extract.collapsed",
+        "extract.pstats",
+        "load.collapsed",
+        "load.pstats",
+    ]
+    stats = pstats.Stats(str(tmp_path / "extract.pstats"))
+    assert any(name == "_busy" for _, _, name in stats.stats)
+    collapsed = (tmp_path / "load.collapsed").read_text()
+    assert "_busy (test_profile.py:" in collapsed
+    assert "_records" not in collapsed
+
+
+def test_profile_nested():
+    profiler = Profiler()
+    with profiler.enter("load"):
+        with profiler.enter("transform"):
+            profiler.sample()
+        profiler.sample()
+    assert not profiler.active
+    assert sum(profiler.stacks["transform"].values()) == 1
+    assert sum(profiler.stacks["load"].values()) == 1
@@ -1,10 +1,11 @@
+import tracemalloc
 from io import BytesIO
 
 import pytest
 from pantomime.types import CSV, XLSX
 
 from investigraph.exceptions import ImproperlyConfigured
-from investigraph.model import Config, Resolver
+from investigraph.model import Config, Resolver, Source
 
 
 def test_resolve(eu_authorities: Config, ec_meetings_local: Config):
@@ -40,3 +41,36 @@ def test_resolve(eu_authorities: Config, ec_meetings_local: Config):
         with pytest.raises(ImproperlyConfigured):
             res.get_content()
     assert tested
+
+
+def test_resolve_stream_chunks(tmp_path):
+    # stream a (scaled down) large local csv file and make sure the chunker
+    # doesn't accumulate memory proportional to file or chunk count
+    path = tmp_path / "large.csv"
+    line = b"a-value,another-value,yet-another-value,and-some-more-text-here\n"
+    lines = 500_000  # ~32 MB
+    with open(path, "wb") as fh:
+        fh.write(b"a,b,c,d\n")
+        for _ in range(lines // 1_000):
+            fh.write(line * 1_000)
+
+    source = Source(uri=path)
+    assert source.stream
+    res = Resolver(source=source)
+
+    tracemalloc.start()
+    chunks = 0
+    size = 0
+    for chunk in res.iter(10_000):
+        assert isinstance(chunk, BytesIO)
+        assert chunk.tell() == 0
+        size += len(chunk.getbuffer())
+        chunks += 1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert chunks == 51
+    # every line gets an extra "\r" separator
+    assert size == path.stat().st_size + lines + 1
+    # peak memory is bound by a few chunks (~640 KB each), not by file size
+    assert peak < 5 * 1024 * 1024
@@ -0,0 +1,47 @@
+from investigraph.logic import fetch
+from investigraph.model import Resolver, Source
+from investigraph.session import get_head_cache, get_session, get_stats
+from investigraph.settings import SETTINGS
+
+
+def test_session():
+    session = get_session()
+    assert session is get_session()
+    adapter = session.get_adapter("https://example.org")
+    assert adapter is session.get_adapter("http://localhost:8000")
+    assert adapter._pool_connections == SETTINGS.http_pool_connections
+    assert adapter._pool_maxsize == SETTINGS.http_pool_maxsize
+    assert adapter.max_retries.total == SETTINGS.http_retries
+
+    # all call sites share the same pool for a host
+    uri = "http://localhost:8000/all-authorities.csv"
+    assert Source(uri=uri).head().content_type == "text/csv"
+    res = fetch.get(uri, cache=False)
+    assert res.ok
+    pools = adapter.poolmanager.pools
+    keys = [k for k in pools.keys() if (k.key_host, k.key_port) == ("localhost", 8000)]
+    assert len(keys) == 1
+
+
+def test_session_head_cache():
+    uri = "http://localhost:8000/ec-meetings.xlsx"
+    cache = get_head_cache()
+    cache.clear()
+    stats = get_stats()
+    hits, misses = stats["head_hit"], stats["head_miss"]
+
+    head = Source(uri=uri).head()
+    assert stats["head_miss"] == misses + 1
+    # resolver, fetch cache key and source share the cached response
+    res = Resolver(source=Source(uri=uri))
+    assert res.mimetype == head.content_type
+    assert fetch.get_cache_key(uri)
+    assert Source(uri=uri).head() == head
+    assert stats["head_miss"] == misses + 1
+    assert stats["head_hit"] == hits + 3
+
+    # expired
+    cache.ttl = 0
+    Source(uri=uri).head()
+    assert stats["head_miss"] == misses + 2
+    cache.ttl = SETTINGS.http_head_ttl
@@ -0,0 +1,70 @@
+from investigraph.cache import Cache
+from investigraph.settings import SETTINGS
+from investigraph.spool import Spool
+
+
+def test_spool(tmp_path):
+    spool = Spool(tmp_path / "spool" / "cache.db")
+    assert spool.ping()
+    spool.set("a", b"1")
+    spool.set("b", b"2", ex=100)
+    spool.set("c", b"3", ex=-1)  # expired
+    assert spool.get("a") == b"1"
+    assert spool.get("c") is None
+    assert spool.mget(["a", "b", "c", "d"]) == [b"1", b"2", None, None]
+    assert spool.exists("a", "b", "c", "d") == 2
+    assert spool.getdel("a") == b"1"
+    assert spool.get("a") is None
+
+    spool.sadd("set", "x", "y", "y")
+    assert spool.smembers("set") == {b"x", b"y"}
+
+    pipe = spool.pipeline()
+    pipe.set("k", b"v")
+    pipe.mget(["k", "b"])
+    pipe.delete("k", "set")
+    assert pipe.execute() == [True, [b"v", b"2"], 2]
+    assert spool.smembers("set") == set()
+    spool.set("d", b"4")
+    spool.sadd("d_set", "x", "y", "z")
+    assert spool.delete("d", "d_set", "d", "missing") == 2
+
+    # persisted on disk
+    assert Spool(tmp_path / "spool" / "cache.db").get("b") == b"2"
+    assert spool.flushall()
+    assert not spool.exists("b")
+
+
+def test_spool_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "spool", True)
+    monkeypatch.setattr(SETTINGS, "spool_path", tmp_path / "spool.db")
+    cache = Cache()
+    assert isinstance(cache.cache, Spool)
+
+    data = [({"foo": 1}, 1), ({"foo": 2}, 2)]
+    key = cache.set(data)
+    assert cache.get(key, delete=False) == data
+    assert cache.get(key, delete=True) == data
+    assert cache.get(key) is None
+
+    keys = [cache.set(item) for item in ([1], [2], [3])]
+    assert cache.exists(*keys) == 3
+    assert cache.delete(*keys) == 3
+    assert cache.exists(*keys) == 0
+
+    key = cache.sadd("value1", "value2")
+    assert cache.smembers(key, delete=True) == {"value1", "value2"}
+    assert cache.smembers(key) is None
+
+
+def test_spool_expire(tmp_path):
+    spool = Spool(tmp_path / "spool.db")
+    spool.set("run:a", b"1")
+    spool.sadd("run:s", "a", "b")
+    assert spool.strlen("run:a") == 1
+    assert spool.strlen("run:x") == 0
+    assert sorted(spool.scan_iter("run:*")) == [b"run:a", b"run:s"]
+    assert spool.expire("run:s", -1)
+    assert not spool.expire("run:x", 10)
+    assert spool.smembers("run:s") == set()
+    assert list(spool.scan_iter("run:*")) == [b"run:a"]
@@ -70,3 +70,11 @@ def test_util_make_proxy():
     assert "Jane" in proxy.get("name")
     assert proxy.caption == "Jane"
     assert proxy.first("country") == "fr"
+
+
+def test_util_get_shard():
+    keys = [f"s3://bucket/file-{i}.csv" for i in range(100)]
+    shards = [util.get_shard(k, 4) for k in keys]
+    assert shards == [util.get_shard(k, 4) for k in keys]
+    assert set(shards) == {1, 2, 3, 4}
+    assert all(util.get_shard(k, 1) == 1 for k in keys)